@@ -0,0 +1,76 @@
+"""
+benchmarks/cold_start.py - Замер и контроль холодного старта webhook
+
+Запускает чистый интерпретатор, импортирует webhook и собирает Application
+(без сетевых запросов). Завершается с кодом 1, если медиана превышает бюджет
+или при импорте создается переводчик.
+
+    python benchmarks/cold_start.py --budget-ms 1500 --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код, выполняемый в отдельном процессе
+PROBE = """
+import json, time
+started = time.perf_counter()
+import webhook
+imported = time.perf_counter()
+webhook.build_application()
+built = time.perf_counter()
+from services import yandex_translate
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "build_ms": (built - imported) * 1000,
+    "translator_created": yandex_translate._translator is not None,
+}))
+"""
+
+
+def run_probe():
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:cold-start-probe")
+    env.setdefault("YANDEX_API_KEY", "probe")
+    env.setdefault("YANDEX_FOLDER_ID", "probe")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    # Последняя строка - результат, выше могут быть сообщения при запуске
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    build_ms = statistics.median(r["build_ms"] for r in results)
+    total_ms = import_ms + build_ms
+
+    print(f"Импорт webhook: {import_ms:.1f} мс")
+    print(f"Сборка Application: {build_ms:.1f} мс")
+    print(f"Итого: {total_ms:.1f} мс (бюджет {args.budget_ms:.0f} мс)")
+
+    failed = False
+    if any(r["translator_created"] for r in results):
+        print("ОШИБКА: переводчик создается при импорте")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("ОШИБКА: холодный старт превышает бюджет")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
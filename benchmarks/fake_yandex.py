@@ -0,0 +1,165 @@
+"""
+benchmarks/fake_yandex.py - Локальная замена Yandex Translate API для бенчмарков
+
+Отвечает на POST /translate/v2/translate с заданным распределением задержки,
+долей ошибок и лимитом запросов в секунду (сверх лимита - 429).
+Перевод - исходный текст с префиксом языка, например "[en] привет".
+POST /translate/v2/languages отдает список из ста с лишним языков.
+
+    python benchmarks/fake_yandex.py --port 8099 --latency lognormal:0.08:0.4 --error-rate 0.01 --rps-limit 20
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+# Список языков: настоящие коды плюс вымышленные, чтобы клавиатура занимала несколько страниц
+FAKE_LANGUAGES = [{"code": code, "name": code.upper()} for code in (
+    "ru en es fr de it zh ja ko uk be kk tr pl cs pt nl sv fi da no el he ar hi"
+).split()] + [{"code": f"x{i:02d}", "name": f"Language {i}"} for i in range(80)]
+
+
+def parse_latency(spec):
+    """
+    Распределение задержки ответа (секунды):
+    fixed:0.05, uniform:0.02:0.2, lognormal:медиана:сигма
+    """
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda: random.lognormvariate(mu, params[1])
+    raise ValueError(f"Неизвестное распределение задержки: {spec}")
+
+
+class FakeYandexServer:
+    """HTTP/1.1 сервер с keep-alive на asyncio"""
+
+    def __init__(self, latency="fixed:0.05", error_rate=0.0, rps_limit=0, host="127.0.0.1", port=0):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rps_limit = rps_limit
+        self.host = host
+        self.port = port
+        self._server = None
+        self._window = (0, 0)
+
+        self.stats = {"requests": 0, "texts": 0, "chars": 0, "errors": 0, "throttled": 0, "connections": 0}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/translate/v2/translate"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _throttled(self):
+        """Простое окно в одну секунду для лимита запросов"""
+        if not self.rps_limit:
+            return False
+        second = int(time.monotonic())
+        start, count = self._window
+        if start != second:
+            start, count = second, 0
+        self._window = (start, count + 1)
+        return count + 1 > self.rps_limit
+
+    async def _respond(self, payload):
+        """Ответ на запрос перевода: (статус, тело, заголовки)"""
+        self.stats["requests"] += 1
+        if self._throttled():
+            self.stats["throttled"] += 1
+            return 429, {"message": "Too many requests"}, {"Retry-After": "1"}
+
+        await asyncio.sleep(self.latency())
+
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return 503, {"message": "Service unavailable"}, {}
+
+        texts = payload.get("texts", [])
+        target = payload.get("targetLanguageCode", "ru")
+        self.stats["texts"] += len(texts)
+        self.stats["chars"] += sum(len(text) for text in texts)
+        return 200, {
+            "translations": [
+                {"text": f"[{target}] {text}", "detectedLanguageCode": payload.get("sourceLanguageCode", "en")}
+                for text in texts
+            ]
+        }, {}
+
+    async def _handle_connection(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                method, path, _ = request_line.decode().split(" ", 2)
+
+                if method == "POST" and path.startswith("/translate/v2/translate"):
+                    status, payload, extra = await self._respond(json.loads(body or b"{}"))
+                elif method == "POST" and path.startswith("/translate/v2/languages"):
+                    status, payload, extra = 200, {"languages": FAKE_LANGUAGES}, {}
+                else:
+                    status, payload, extra = 404, {"message": "Not found"}, {}
+
+                data = json.dumps(payload).encode()
+                head = [f"HTTP/1.1 {status} X", "Content-Type: application/json", f"Content-Length: {len(data)}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(args):
+    server = await FakeYandexServer(args.latency, args.error_rate, args.rps_limit, args.host, args.port).start()
+    print(f"Фейковый Yandex Translate: {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Yandex Translate API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="lognormal:0.08:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rps-limit", type=int, default=0)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+benchmarks/langdetect.py - Микробенчмарк локального определения языка
+
+Измеряет среднее время detect_language на сообщение и точность на размеченных
+фразах. Завершается с кодом 1, если время превышает бюджет или
+какая-то фраза определена неверно.
+
+    python benchmarks/langdetect.py --budget-us 200 --rounds 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.langdetect import detect_language  # noqa: E402
+
+# (текст, ожидаемый язык); None - язык определить нельзя, решает API
+SAMPLES = [
+    ("Привет, как дела? Давно не виделись", "ru"),
+    ("Сегодня встреча переносится на пятницу", "ru"),
+    ("Завтра встреча переносится на пятницу", None),
+    ("Привіт, як справи? Завтра зустріч", "uk"),
+    ("Утре срещата се отлага за петък", None),
+    ("Здраво, како си данас?", None),
+    ("Hello, how are you doing today?", "en"),
+    ("The meeting has been moved to Friday afternoon", "en"),
+    ("Where is the nearest train station please", "en"),
+    ("Hola, ¿cómo estás? Me llamo Juan", "es"),
+    ("¿Dónde está la biblioteca de la ciudad?", "es"),
+    ("Bonjour, je suis très content de vous voir", "fr"),
+    ("Je voudrais un café et un croissant", "fr"),
+    ("Guten Morgen, wie geht es dir heute?", "de"),
+    ("Das Wetter ist heute wirklich schön", "de"),
+    ("Ciao, come stai? Sono molto felice", "it"),
+    ("Il gatto dorme sul divano tutto il giorno", "it"),
+    ("你好，今天天气很好", "zh"),
+    ("こんにちは、元気ですか", "ja"),
+    ("안녕하세요, 만나서 반갑습니다", "ko"),
+    ("Obrigado pela sua ajuda, até amanhã", None),
+    ("Ik ga morgen naar de winkel", None),
+    ("iPhone 15 Pro Max 256GB", None),
+    ("ok", None),
+    ("12345 67", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-us", type=float, default=200.0)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    errors = [(text, expected, detect_language(text)) for text, expected in SAMPLES]
+    errors = [error for error in errors if error[1] != error[2]]
+
+    texts = [text for text, _ in SAMPLES]
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in texts:
+            detect_language(text)
+    per_message_us = (time.perf_counter() - started) / (args.rounds * len(texts)) * 1e6
+
+    print(f"Сообщений: {args.rounds * len(texts)}")
+    print(f"Время на сообщение: {per_message_us:.1f} мкс (бюджет {args.budget_us:.0f} мкс)")
+    print(f"Точность: {len(SAMPLES) - len(errors)} из {len(SAMPLES)}")
+
+    failed = False
+    for text, expected, detected in errors:
+        print(f"ОШИБКА: {text!r} - ожидался {expected}, определен {detected}")
+        failed = True
+    if per_message_us > args.budget_us:
+        print("ОШИБКА: определение языка превышает бюджет")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+benchmarks/load.py - Нагрузочный бенчмарк бота без сети
+
+Поднимает локальный фейковый Yandex Translate, подменяет отправку в Bot API
+заглушкой и прогоняет синтетические обновления через настоящие обработчики:
+быстрый перевод, диалог /translate и /status. Результат пишется в JSON,
+чтобы сравнивать коммиты между собой.
+
+    python benchmarks/load.py --users 200 --updates 2000 --rate 300 --output bench_results.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_yandex import FakeYandexServer  # noqa: E402
+
+# Фразы для быстрого перевода: частые повторяются, как в реальном чате
+PHRASES = [
+    "hello", "thank you", "good morning", "how are you?", "see you tomorrow",
+    "where is the train station?", "I would like a cup of coffee, please.",
+    "The meeting has been moved to Thursday at 3 pm.",
+    "Could you send me the report before the end of the day?",
+    "This is a forwarded channel post about the new release and its features.",
+]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class FakeTelegramRequest:
+    """Заглушка Bot API: отвечает успехом и считает вызовы по методам"""
+
+    def __new__(cls, latency=0.0):
+        # Базовый класс импортируется после настройки окружения
+        from telegram.request import BaseRequest
+
+        class _Request(BaseRequest):
+            read_timeout = None
+
+            def __init__(self):
+                self.calls = {}
+                self._message_ids = itertools.count(1)
+
+            async def initialize(self):
+                pass
+
+            async def shutdown(self):
+                pass
+
+            async def do_request(self, url, method, request_data=None, **kwargs):
+                name = url.rsplit("/", 1)[-1]
+                params = request_data.parameters if request_data else {}
+                self.calls[name] = self.calls.get(name, 0) + 1
+                if latency:
+                    await asyncio.sleep(latency)
+
+                if name == "getMe":
+                    result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+                elif "chat_id" in params and name.startswith(("send", "edit")) and name != "sendChatAction":
+                    result = {
+                        "message_id": params.get("message_id") or next(self._message_ids),
+                        "date": int(time.time()),
+                        "chat": {"id": params["chat_id"], "type": "private"},
+                        "text": params.get("text", ""),
+                    }
+                else:
+                    result = True
+                return 200, json.dumps({"ok": True, "result": result}).encode()
+
+        return _Request()
+
+
+class UpdateFactory:
+    """Синтетические обновления Telegram в виде JSON"""
+
+    def __init__(self, seed=1):
+        self.random = random.Random(seed)
+        self._ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def message(self, user_id, text):
+        message = {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._ids), "message": message}
+
+    def callback(self, user_id, data):
+        return {
+            "update_id": next(self._ids),
+            "callback_query": {
+                "id": str(next(self._ids)),
+                "chat_instance": str(user_id),
+                "from": self._user(user_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._ids),
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "Выберите язык для перевода:",
+                },
+            },
+        }
+
+    def phrase(self):
+        # Распределение Ципфа: первые фразы встречаются чаще
+        index = min(int(self.random.paretovariate(1.2)) - 1, len(PHRASES) - 1)
+        return PHRASES[index] + ("" if self.random.random() < 0.7 else f" #{self.random.randint(1, 50)}")
+
+    def workload(self, users, total):
+        """Список (user_id, update) в порядке поступления"""
+        updates = []
+        while len(updates) < total:
+            user_id = self.random.randint(1, users)
+            kind = self.random.random()
+            if kind < 0.7:
+                updates.append((user_id, self.message(user_id, self.phrase())))
+            elif kind < 0.9:
+                lang = self.random.choice(["en", "es", "de", "fr"])
+                updates.append((user_id, self.message(user_id, "/translate")))
+                updates.append((user_id, self.callback(user_id, f"lang_{lang}")))
+                updates.append((user_id, self.message(user_id, self.phrase())))
+            else:
+                updates.append((user_id, self.message(user_id, "/status")))
+        return updates[:total]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+async def run(args):
+    server = await FakeYandexServer(args.latency, args.error_rate, args.rps_limit).start()
+
+    # Настройки бота до первого импорта config
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    os.environ.setdefault("YANDEX_API_KEY", "benchmark")
+    os.environ.setdefault("YANDEX_FOLDER_ID", "benchmark")
+    os.environ.setdefault("DAILY_LIMIT", "1000000")
+    # Лимиты гранта не мешают измерять сам бот (провайдера ограничивает --rps-limit)
+    os.environ.setdefault("API_REQUESTS_PER_SECOND", "1000")
+    os.environ.setdefault("API_CHARS_PER_SECOND", "1000000")
+    # Заглушка Bot API не ограничивает отправку - лимиты Telegram тоже снимаются
+    os.environ.setdefault("TELEGRAM_GLOBAL_RATE", "100000")
+    os.environ.setdefault("TELEGRAM_CHAT_RATE", "100000")
+    os.environ.setdefault("TELEGRAM_GROUP_RATE", "100000")
+    os.environ["YANDEX_TRANSLATE_URL"] = server.url
+
+    import logging
+    from telegram import Update
+    import bot
+    from services.yandex_translate import get_translator
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    request = FakeTelegramRequest(args.telegram_latency)
+    application = bot.build_application(request=request)
+    await application.initialize()
+    processor = application.update_processor
+
+    updates = UpdateFactory(args.seed).workload(args.users, args.updates)
+    latencies = []
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    async def process(payload):
+        started = time.perf_counter()
+        update = Update.de_json(payload, application.bot)
+        await processor.process_update(update, application.process_update(update))
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = []
+    interval = 1 / args.rate if args.rate else 0
+    for index, (_, payload) in enumerate(updates):
+        tasks.append(asyncio.create_task(process(payload)))
+        # Открытая модель нагрузки: обновления приходят с заданной частотой
+        if interval:
+            delay = started + (index + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    translator = get_translator()
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": vars(args),
+        "updates": len(updates),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(updates) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+        },
+        "api": dict(server.stats),
+        "api_calls_per_update": round(server.stats["requests"] / len(updates), 4),
+        "telegram_calls": request.calls,
+        "max_rss_growth_kb": rss_after - rss_before,
+        "cache": translator.cache.stats(),
+    }
+
+    await application.shutdown()
+    await bot.close_translator()
+    await server.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк бота без сети")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=300, help="обновлений в секунду, 0 - все сразу")
+    parser.add_argument("--latency", default="lognormal:0.08:0.4", help="задержка фейкового API")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rps-limit", type=int, default=0)
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="задержка заглушки Bot API, сек")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"Обновлений: {result['updates']} за {result['elapsed_s']} с ({result['updates_per_s']}/с)")
+    print(f"Задержка, мс: p50={result['latency_ms']['p50']} p95={result['latency_ms']['p95']} p99={result['latency_ms']['p99']}")
+    print(f"Запросов к API на обновление: {result['api_calls_per_update']}")
+    print(f"Рост памяти (max RSS): {result['max_rss_growth_kb']} КБ")
+    print(f"Результат: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
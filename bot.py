@@ -2,76 +2,212 @@
 bot.py - Главный файл Telegram бота
 """
 
+import asyncio
+import functools
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler, CallbackQueryHandler
+import signal
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, filters, ConversationHandler, CallbackQueryHandler,
+    InlineQueryHandler, ChosenInlineResultHandler
+)
+
+from telegram.request import HTTPXRequest
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN, CONCURRENT_UPDATES, UPDATE_DEADLINE, SHUTDOWN_GRACE,
+    STATE_DB_PATH, STATE_MAX_USERS, STATE_UPDATE_INTERVAL, CONVERSATION_TIMEOUT,
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE, TELEGRAM_RETRIES,
+    LOG_LEVEL, LOG_SAMPLE_RATE, LOG_TEXT_PREVIEW, METRICS_PORT
+)
+from services.http import ssl_context
+from services.inflight import inflight
+from services.log import setup_logging, stop_logging
+from services.metrics import start_metrics_server
+from services.persistence import CompactPersistence
+from services.send_scheduler import SendScheduler
+from services.update_processor import PerUserUpdateProcessor
+from services.yandex_translate import close_translator
 
 # Импорт обработчиков
 from handlers.start_help import start_command, help_command
 from handlers.common import unknown_command
+from handlers.document import document_translate
+from handlers.glossary import glossary_command
+from handlers.group import autotranslate_command, group_message, close_digests
+from handlers.inline import inline_query, chosen_inline_result
 from handlers.translate_handler import (
     start_translate_command, language_selected, process_text,
     cancel_translate, quick_translate, handle_quick_button,
-    show_languages_command, status_command, reset_command,
+    show_languages_command, status_command, reset_command, budget_command, metrics_command,
     WAITING_FOR_LANGUAGE, WAITING_FOR_TEXT
 )
 
-# Красивое логирование
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Структурированное логирование через очередь
+setup_logging(LOG_LEVEL, LOG_SAMPLE_RATE, LOG_TEXT_PREVIEW)
+# Строка о каждом запросе httpx - лишний вывод на горячем пути
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+logger = logging.getLogger(__name__)
+
+# Типы обновлений, которые получает бот
+ALLOWED_UPDATES = ["message", "callback_query", "inline_query", "chosen_inline_result"]
+
+# Дообработка начатой работы после сигнала остановки
+_draining = None
+
+
+def _install_stop_signals(application):
+    """
+    SIGINT/SIGTERM: прием обновлений прекращается, начатые переводы
+    дообрабатываются не дольше SHUTDOWN_GRACE секунд, затем отменяются
+    """
+    loop = asyncio.get_running_loop()
+
+    def stop():
+        global _draining
+        if _draining is None:
+            logger.info("Остановка", extra={"grace_s": SHUTDOWN_GRACE})
+            _draining = loop.create_task(inflight.drain(SHUTDOWN_GRACE))
+        application.stop_running()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows или не главный поток: остановка по KeyboardInterrupt без ожидания
+            return
+
+
+async def post_init(application):
+    """Эндпоинт /metrics для Prometheus (если задан METRICS_PORT) и сигналы остановки"""
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_PORT)
+        logger.info("Метрики доступны", extra={"port": METRICS_PORT})
+    _install_stop_signals(application)
+
+
+async def post_stop(application):
+    """Публикация накопленных сводок групп, пока бот еще может отправлять сообщения"""
+    await close_digests()
+
+
+async def shutdown(application):
+    """Закрытие пула HTTP-соединений и файла состояния при остановке"""
+    if _draining is not None:
+        await _draining
+    await close_translator()
+    application.persistence.close()
+
+
+def build_application(request=None, webhook=False):
+    """
+    Создание Application со всеми обработчиками (без запуска)
+    request - своя реализация BaseRequest для Bot API (например, заглушка в бенчмарках)
+    webhook - режим webhook.py: экземпляр функции может быть заморожен сразу
+    после ответа, поэтому файлы и inline-запросы обрабатываются до него
+    """
+    # Настройки пользователей и диалоги (без STATE_DB_PATH - только в памяти, с ограничением)
+    persistence = CompactPersistence(
+        STATE_DB_PATH or ":memory:",
+        max_users=STATE_MAX_USERS,
+        conversation_timeout=CONVERSATION_TIMEOUT,
+        update_interval=STATE_UPDATE_INTERVAL,
+    )
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(request or HTTPXRequest(httpx_kwargs={"verify": ssl_context()}))
+        .get_updates_request(HTTPXRequest(connection_pool_size=1, httpx_kwargs={"verify": ssl_context()}))
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES, deadline=UPDATE_DEADLINE))
+        .rate_limiter(SendScheduler(
+            TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE, max_retries=TELEGRAM_RETRIES
+        ))
+        .persistence(persistence)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(shutdown)
+        .build()
+    )
+    persistence.attach(application)
+    logger.info("Application создан")
+    
+    # Состояние для перевода
+    translate_handler = ConversationHandler(
+        entry_points=[CommandHandler("translate", start_translate_command)],
+        states={
+            WAITING_FOR_LANGUAGE: [
+                CallbackQueryHandler(language_selected)
+            ],
+            WAITING_FOR_TEXT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, process_text)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", cancel_translate)],
+        # Состояние диалога сохраняется между перезапусками
+        name="translate",
+        persistent=True,
+    )
+    
+    # Регистрация обработчиков
+    
+    # Базовые команды
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("languages", show_languages_command))
+    application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("reset", reset_command))
+    application.add_handler(CommandHandler("budget", budget_command))
+    application.add_handler(CommandHandler("metrics", metrics_command))
+    application.add_handler(CommandHandler("glossary", glossary_command))
+    application.add_handler(CommandHandler("autotranslate", autotranslate_command))
+    
+    # Группы с автопереводом: сообщения уходят в сводку и дальше не обрабатываются
+    application.add_handler(
+        MessageHandler(filters.ChatType.GROUPS & filters.TEXT & ~filters.COMMAND, group_message), group=-1
+    )
+    
+    # Перевод
+    application.add_handler(translate_handler)
+    # /cancel вне диалога: выполняющийся перевод отменяет PerUserUpdateProcessor
+    application.add_handler(CommandHandler("cancel", cancel_translate))
+    
+    # Быстрый перевод
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, quick_translate))
+    
+    # Кнопки быстрого перевода
+    application.add_handler(CallbackQueryHandler(handle_quick_button, pattern="^quick_"))
+    
+    # Файлы: перевод не блокирует остальные сообщения пользователя
+    application.add_handler(MessageHandler(filters.Document.ALL, document_translate, block=webhook))
+    
+    # Inline-режим: запрос не блокирует очередь пользователя, чтобы новый мог отменить предыдущий.
+    # В режиме webhook каждый запрос переводится сразу, без паузы в наборе
+    application.add_handler(InlineQueryHandler(
+        functools.partial(inline_query, debounce=0) if webhook else inline_query, block=webhook
+    ))
+    application.add_handler(ChosenInlineResultHandler(chosen_inline_result))
+    
+    # Неизвестные команды
+    application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
+    
+    return application
+
 
 def main():
     """Запуск бота"""
     
     try:
-        application = Application.builder().token(BOT_TOKEN).build()
-        print("Application создан")
-        
-        # Состояние для перевода
-        translate_handler = ConversationHandler(
-            entry_points=[CommandHandler("translate", start_translate_command)],
-            states={
-                WAITING_FOR_LANGUAGE: [
-                    CallbackQueryHandler(language_selected)
-                ],
-                WAITING_FOR_TEXT: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, process_text)
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", cancel_translate)]
-        )
-        
-        # Регистрация обработчиков
-        
-        # Базовые команды
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("languages", show_languages_command))
-        application.add_handler(CommandHandler("status", status_command))
-        application.add_handler(CommandHandler("reset", reset_command))
-        
-        # Перевод
-        application.add_handler(translate_handler)
-        
-        # Быстрый перевод
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, quick_translate))
-        
-        # Кнопки быстрого перевода
-        application.add_handler(CallbackQueryHandler(handle_quick_button, pattern="^quick_"))
-        
-        # Неизвестные команды
-        application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
+        application = build_application()
         
-        print("Бот запущен!")
+        logger.info("Бот запущен!")
         
-        # Запуск бота
-        application.run_polling(allowed_updates=["message", "callback_query"])
+        # Запуск бота (сигналы остановки устанавливает post_init)
+        application.run_polling(allowed_updates=ALLOWED_UPDATES, stop_signals=None)
         
-    except Exception as e:
-        print(f"Ошибка: {e}")
+    except Exception:
+        logger.exception("Ошибка")
+    finally:
+        stop_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
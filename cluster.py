@@ -0,0 +1,275 @@
+"""
+cluster.py - Запуск бота в нескольких процессах
+
+Процесс-фронт получает обновления (polling или webhook) и раздает их
+WORKERS процессам-воркерам по согласованному хэшу пользователя: обновления
+одного пользователя обрабатываются по порядку одним воркером, разные
+пользователи - параллельно на всех ядрах. Сообщения групп с автопереводом
+и /autotranslate идут по хэшу чата: у группы одна сводка на одном воркере
+(список таких групп фронт перечитывает из STATE_DB_PATH). Лимиты и кэш общие для воркеров
+при QUOTA_BACKEND=sqlite и CACHE_DB_PATH.
+
+Сигналы фронту: SIGTERM/SIGINT - остановка с дообработкой полученных
+обновлений (не дольше SHUTDOWN_GRACE секунд), SIGUSR1 - добавить воркер, SIGUSR2 - остановить последний воркер.
+
+    WORKERS=4 QUOTA_BACKEND=sqlite CACHE_DB_PATH=cache.db python cluster.py
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from telegram import Bot, Update
+from telegram.ext import Updater
+from telegram.request import HTTPXRequest
+
+from bot import ALLOWED_UPDATES, build_application
+from handlers.group import close_digests
+from config import (
+    BOT_TOKEN, WORKERS, STICKY_IDLE, QUOTA_BACKEND, STATE_DB_PATH,
+    CLUSTER_WEBHOOK_URL, CLUSTER_WEBHOOK_PORT, WEBHOOK_SECRET, SHUTDOWN_GRACE
+)
+from services.http import ssl_context
+from services.inflight import inflight
+from services.log import stop_logging
+from services.persistence import read_group_langs
+from services.sharding import HashRing, ShardRouter
+from services.update_processor import PerUserUpdateProcessor
+from services.yandex_translate import get_translator
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять воркеры и чистить закрепления пользователей, секунд
+SUPERVISE_INTERVAL = 1.0
+
+
+def run_worker(worker_id, inbox, outbox):
+    """Точка входа процесса-воркера"""
+    # Сигналы остановки обрабатывает фронт, воркер останавливается по его команде
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_main(worker_id, inbox, outbox))
+
+
+async def _worker_main(worker_id, inbox, outbox):
+    """
+    Воркер обрабатывает обновления из inbox обычным Application и сообщает
+    фронту о каждом обработанном обновлении. None в inbox - остановка
+    после дообработки принятых обновлений (не дольше SHUTDOWN_GRACE секунд)
+    """
+    application = build_application()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    async def process(update, key):
+        try:
+            # Тот же путь, что у Application: общий семафор и очередь пользователя
+            await application.update_processor.process_update(update, application.process_update(update))
+        except Exception:
+            logger.exception("Ошибка обработки обновления", extra={"worker": worker_id})
+        finally:
+            outbox.put(("done", worker_id, key))
+
+    async with application:
+        # start() без Updater: обновления приходят из inbox, а start нужен ради
+        # периодической записи настроек и диалогов в общий файл (update_persistence)
+        await application.start()
+        logger.info("Воркер запущен", extra={"worker": worker_id})
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            if message is None:
+                break
+            data, key, fresh = message
+            if fresh and key is not None and key > 0:
+                # Пользователь (у групп ключ отрицательный) пришел от другого воркера -
+                # его счетчики и настройки перечитываются (запись счетчиков - не на цикле событий)
+                await asyncio.to_thread(get_translator().forget_user, key)
+                application.persistence.forget(key)
+            task = asyncio.create_task(process(Update.de_json(data, application.bot), key))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Незавершенная за SHUTDOWN_GRACE работа отменяется с возвратом лимита
+        await inflight.drain(SHUTDOWN_GRACE)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await close_digests()
+        # Последняя запись изменений перед выходом
+        await application.stop()
+    logger.info("Воркер остановлен", extra={"worker": worker_id})
+
+
+class Front:
+    """Фронт: получение обновлений, маршрутизация и управление воркерами"""
+
+    def __init__(self, workers=WORKERS, sticky_idle=STICKY_IDLE):
+        self.context = multiprocessing.get_context("spawn")
+        self.outbox = self.context.Queue()
+        self.router = ShardRouter(HashRing(), sticky_idle=sticky_idle)
+        self.workers = {}
+        self.draining = set()
+        self.initial_workers = max(workers, 1)
+        self._next_id = 0
+        self._stopping = False
+        # Группы с автопереводом (из общего файла состояния)
+        self.auto_groups = set()
+
+    def start_worker(self, worker_id=None):
+        """Запуск воркера и добавление его в кольцо"""
+        if worker_id is None:
+            worker_id = self._next_id
+            self._next_id += 1
+        inbox = self.context.Queue()
+        process = self.context.Process(
+            target=run_worker, args=(worker_id, inbox, self.outbox), name=f"bot-worker-{worker_id}"
+        )
+        process.start()
+        self.workers[worker_id] = (process, inbox)
+        self.router.ring.add(worker_id)
+        logger.info("Воркер добавлен", extra={"worker": worker_id, "workers": len(self.router.ring)})
+        return worker_id
+
+    def drain_worker(self, worker_id):
+        """
+        Удаление воркера из кольца: новые пользователи к нему не попадают,
+        закрепленные уходят, как только их обновления обработаны.
+        Процесс останавливается, когда у него не останется обновлений
+        """
+        if worker_id not in self.workers or len(self.router.ring) <= 1:
+            return
+        self.router.ring.remove(worker_id)
+        self.draining.add(worker_id)
+        logger.info("Воркер выводится", extra={"worker": worker_id})
+
+    def _route_key(self, update):
+        """
+        Ключ маршрутизации: группа (отрицательный id чата) для сообщений в сводку
+        и /autotranslate, для всего остального - пользователь: его лимит и настройки
+        живут в памяти одного воркера
+        """
+        chat = update.effective_chat
+        message = update.message
+        if chat is not None and chat.type in (chat.GROUP, chat.SUPERGROUP) and message is not None and message.text:
+            if message.text.startswith("/"):
+                if message.text.split(maxsplit=1)[0].split("@", 1)[0] == "/autotranslate":
+                    return chat.id
+            elif chat.id in self.auto_groups:
+                return chat.id
+        return PerUserUpdateProcessor._update_key(update)
+
+    def dispatch(self, update):
+        """Отправка обновления воркеру пользователя"""
+        key = self._route_key(update)
+        worker_id, fresh = self.router.route(key)
+        self.workers[worker_id][1].put((update.to_dict(), key, fresh))
+
+    async def _read_outbox(self):
+        """Подтверждения обработки от воркеров"""
+        loop = asyncio.get_running_loop()
+        while True:
+            kind, _, key = await loop.run_in_executor(None, self.outbox.get)
+            if kind == "stop":
+                return
+            self.router.done(key)
+
+    async def _supervise(self):
+        """Перезапуск упавших воркеров, остановка выведенных, очистка закреплений"""
+        while not self._stopping:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for worker_id, (process, inbox) in list(self.workers.items()):
+                if worker_id in self.draining:
+                    if not self.router.pending(worker_id) or not process.is_alive():
+                        inbox.put(None)
+                        await asyncio.to_thread(process.join)
+                        del self.workers[worker_id]
+                        self.draining.discard(worker_id)
+                        logger.info("Воркер остановлен", extra={"worker": worker_id})
+                elif not process.is_alive():
+                    logger.warning("Воркер упал, перезапуск", extra={"worker": worker_id, "exitcode": process.exitcode})
+                    self.router.node_lost(worker_id)
+                    self.start_worker(worker_id)
+            self.router.prune()
+            if STATE_DB_PATH:
+                self.auto_groups = set(await asyncio.to_thread(read_group_langs, STATE_DB_PATH))
+
+    async def run(self):
+        if QUOTA_BACKEND != "sqlite":
+            logger.warning("Лимиты хранятся в памяти воркеров и теряются при переезде пользователей (QUOTA_BACKEND=sqlite)")
+        if STATE_DB_PATH:
+            self.auto_groups = set(read_group_langs(STATE_DB_PATH))
+        else:
+            logger.warning("Настройки автоперевода групп не общие для воркеров (STATE_DB_PATH)")
+
+        for _ in range(self.initial_workers):
+            self.start_worker()
+
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        loop.add_signal_handler(signal.SIGUSR1, self.start_worker)
+        loop.add_signal_handler(signal.SIGUSR2, lambda: self.drain_worker(max(self.router.ring.nodes)))
+
+        reader = asyncio.create_task(self._read_outbox())
+        supervisor = asyncio.create_task(self._supervise())
+
+        bot = Bot(
+            BOT_TOKEN,
+            request=HTTPXRequest(httpx_kwargs={"verify": ssl_context()}),
+            get_updates_request=HTTPXRequest(read_timeout=30, httpx_kwargs={"verify": ssl_context()}),
+        )
+        updates = asyncio.Queue()
+        updater = Updater(bot, updates)
+
+        async with updater:
+            if CLUSTER_WEBHOOK_URL:
+                # Нужен python-telegram-bot[webhooks]
+                await updater.start_webhook(
+                    listen="0.0.0.0", port=CLUSTER_WEBHOOK_PORT, webhook_url=CLUSTER_WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET or None, allowed_updates=ALLOWED_UPDATES,
+                )
+            else:
+                await updater.start_polling(allowed_updates=ALLOWED_UPDATES)
+            logger.info("Фронт запущен", extra={"workers": len(self.workers)})
+
+            waiter = asyncio.create_task(stop.wait())
+            while True:
+                getter = asyncio.create_task(updates.get())
+                done, _ = await asyncio.wait({getter, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    break
+                update = getter.result()
+                if isinstance(update, Update):
+                    self.dispatch(update)
+
+            # Остановка: новые обновления не принимаются, полученные дообрабатываются
+            await updater.stop()
+            while not updates.empty():
+                update = updates.get_nowait()
+                if isinstance(update, Update):
+                    self.dispatch(update)
+
+        self._stopping = True
+        supervisor.cancel()
+        for _, inbox in self.workers.values():
+            inbox.put(None)
+        for process, _ in self.workers.values():
+            await asyncio.to_thread(process.join)
+        self.outbox.put(("stop", None, None))
+        await reader
+        logger.info("Фронт остановлен")
+
+
+def main():
+    try:
+        asyncio.run(Front().run())
+    except Exception:
+        logger.exception("Ошибка")
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
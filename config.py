@@ -1,6 +1,7 @@
 """
 config.py - Загрузка конфигурации и переменных окружения
 """
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -13,4 +14,144 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("❌ BOT_TOKEN не найден! Проверь файл .env")
 
-print("✅ Токен бота получен")
\ No newline at end of file
+logging.getLogger(__name__).info("Токен бота получен")
+
+# Доступ к Yandex Translate (проверяется при создании переводчика)
+YANDEX_API_KEY = os.getenv("YANDEX_API_KEY")
+YANDEX_FOLDER_ID = os.getenv("YANDEX_FOLDER_ID")
+YANDEX_TRANSLATE_URL = os.getenv(
+    "YANDEX_TRANSLATE_URL", "https://translate.api.cloud.yandex.net/translate/v2/translate"
+)
+# Список языков (по умолчанию - рядом с адресом перевода)
+YANDEX_LANGUAGES_URL = os.getenv(
+    "YANDEX_LANGUAGES_URL", YANDEX_TRANSLATE_URL.rsplit("/", 1)[0] + "/languages"
+)
+# Как часто обновлять список языков, секунд
+LANGUAGES_REFRESH_INTERVAL = int(os.getenv("LANGUAGES_REFRESH_INTERVAL", "86400"))
+
+# Секрет webhook (заголовок X-Telegram-Bot-Api-Secret-Token), пусто - без проверки
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Пул HTTP-соединений к Yandex Translate
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "50"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+
+# Сколько обновлений Telegram обрабатывать одновременно
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+# Режим нескольких процессов (cluster.py): число воркеров и сколько секунд
+# пользователь остается у прежнего воркера после изменения их состава
+WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+STICKY_IDLE = float(os.getenv("STICKY_IDLE", "60"))
+# Webhook фронта (если не задан - polling); нужен python-telegram-bot[webhooks]
+CLUSTER_WEBHOOK_URL = os.getenv("CLUSTER_WEBHOOK_URL", "")
+CLUSTER_WEBHOOK_PORT = int(os.getenv("CLUSTER_WEBHOOK_PORT", "8443"))
+
+# Настройки пользователей и диалоги: файл SQLite (пусто - без сохранения),
+# сколько пользователей держать в памяти, через сколько секунд простоя
+# диалог /translate завершается, как часто передавать изменения на запись
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "")
+STATE_MAX_USERS = int(os.getenv("STATE_MAX_USERS", "10000"))
+STATE_UPDATE_INTERVAL = float(os.getenv("STATE_UPDATE_INTERVAL", "5"))
+CONVERSATION_TIMEOUT = int(os.getenv("CONVERSATION_TIMEOUT", "3600"))
+
+# Исходящие запросы к Bot API: в секунду на бота, в личный чат и в группу,
+# повторы после RetryAfter
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+TELEGRAM_RETRIES = int(os.getenv("TELEGRAM_RETRIES", "2"))
+
+# Сколько секунд ждать перевода, прежде чем показать "печатает"
+# (перевод из кэша приходит раньше, и действие не отправляется)
+TYPING_DELAY = float(os.getenv("TYPING_DELAY", "0.2"))
+
+# Inline-режим: пауза после последнего нажатия клавиши перед переводом
+# и сколько секунд Telegram может хранить ответ
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.4"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+# Перевод файлов: максимальный размер (байт), сколько символов файла
+# считаются одним переводом, одновременные запросы и интервал обновления прогресса
+DOCUMENT_MAX_SIZE = int(os.getenv("DOCUMENT_MAX_SIZE", str(1024 * 1024)))
+DOCUMENT_CHARS_PER_USE = int(os.getenv("DOCUMENT_CHARS_PER_USE", "10000"))
+DOCUMENT_CONCURRENCY = int(os.getenv("DOCUMENT_CONCURRENCY", "4"))
+DOCUMENT_PROGRESS_INTERVAL = float(os.getenv("DOCUMENT_PROGRESS_INTERVAL", "2"))
+
+# Автоперевод групп (/autotranslate): сколько секунд дописывается одна сводка
+# и как часто переводятся накопленные сообщения
+GROUP_DIGEST_WINDOW = float(os.getenv("GROUP_DIGEST_WINDOW", "60"))
+GROUP_DIGEST_INTERVAL = float(os.getenv("GROUP_DIGEST_INTERVAL", "5"))
+
+# Сроки обработки (секунд с получения обновления): сообщения, длинного текста
+# и файла; сколько при остановке бота дообрабатывается начатая работа
+UPDATE_DEADLINE = float(os.getenv("UPDATE_DEADLINE", "8"))
+LONG_TEXT_DEADLINE = float(os.getenv("LONG_TEXT_DEADLINE", "60"))
+DOCUMENT_DEADLINE = float(os.getenv("DOCUMENT_DEADLINE", "600"))
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "10"))
+
+# Объединение переводов в один запрос к API
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "20"))
+BATCH_MAX_TEXTS = int(os.getenv("BATCH_MAX_TEXTS", "100"))
+BATCH_MAX_CHARS = int(os.getenv("BATCH_MAX_CHARS", "10000"))
+
+# Кэш переводов: в памяти и (если указан путь) на диске
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_TTL = int(os.getenv("CACHE_TTL", "86400"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+CACHE_DB_TTL = int(os.getenv("CACHE_DB_TTL", str(7 * 86400)))
+# Засчитывать ли переводы из кэша в дневной лимит пользователя
+CACHE_HITS_COUNT = os.getenv("CACHE_HITS_COUNT", "0") == "1"
+
+# Дневной лимит переводов и хранилище счетчиков: memory или sqlite
+DAILY_LIMIT = int(os.getenv("DAILY_LIMIT", "20"))
+QUOTA_BACKEND = os.getenv("QUOTA_BACKEND", "memory")
+QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH", "quota.db")
+QUOTA_FLUSH_INTERVAL = float(os.getenv("QUOTA_FLUSH_INTERVAL", "1"))
+
+# Лимиты API (грант Yandex Cloud): запросы и символы в секунду, символы в день (0 - без ограничения)
+API_REQUESTS_PER_SECOND = float(os.getenv("API_REQUESTS_PER_SECOND", "20"))
+API_CHARS_PER_SECOND = float(os.getenv("API_CHARS_PER_SECOND", "250"))
+API_DAILY_CHARS = int(os.getenv("API_DAILY_CHARS", "0"))
+# Сколько запросов может ждать в очереди, прежде чем бот начнет отказывать
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", "200"))
+
+# Повторы при временных ошибках API (429, 5xx, сеть) и автоматический выключатель
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF_BASE = float(os.getenv("API_BACKOFF_BASE", "0.2"))
+API_BACKOFF_MAX = float(os.getenv("API_BACKOFF_MAX", "3"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+# Дублирующий запрос, если ответ дольше p95 (но не раньше HEDGE_MIN_DELAY сек)
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.3"))
+
+# Память переводов: повторное использование переводов похожих текстов
+# (TM_THRESHOLD - минимальное сходство от 0 до 1; 1 - только отличия в регистре, пробелах и числах,
+# меньше 1 - и похожие тексты, но сходство по буквам не замечает изменений смысла)
+TM_ENABLED = os.getenv("TM_ENABLED", "1") == "1"
+TM_THRESHOLD = float(os.getenv("TM_THRESHOLD", "1"))
+TM_MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "20000"))
+
+# Общий глоссарий (JSON: {"en-ru": {"термин": "перевод"}})
+GLOSSARY_PATH = os.getenv("GLOSSARY_PATH", "")
+
+# Сколько исходных текстов быстрого перевода помнить для кнопок
+QUICK_STORE_SIZE = int(os.getenv("QUICK_STORE_SIZE", "5000"))
+
+# Логирование: уровень, доля сохраняемых записей INFO и ниже,
+# сколько первых символов текста пользователя писать в лог (0 - только длина и хэш)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+LOG_TEXT_PREVIEW = int(os.getenv("LOG_TEXT_PREVIEW", "0"))
+
+# Метрики Prometheus: порт HTTP-эндпоинта /metrics в режиме polling (0 - выключен)
+# и токен для /metrics в режиме webhook (пусто - выключен)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Администраторы бота (id через запятую)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
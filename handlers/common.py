@@ -2,10 +2,40 @@
 handlers/common.py - Общие обработчики
 """
 
+import asyncio
+
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
+from config import TYPING_DELAY
+from services.metrics import instrument
+
+# Ответ, когда API перегружено или недоступно
+BUSY_TEXT = "Сервис перевода сейчас перегружен или недоступен. Попробуйте через минуту."
+
+
+async def with_typing(chat, awaitable):
+    """
+    Ожидание перевода с действием "печатает", которое отправляется,
+    только если перевод не готов за TYPING_DELAY
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=TYPING_DELAY)
+        if not done:
+            try:
+                await chat.send_action(action="typing")
+            except TelegramError:
+                # Действие несрочное - его ошибка не мешает переводу
+                pass
+        return await task
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
 
+@instrument("unknown_command")
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик неизвестных команд
@@ -16,4 +46,4 @@ async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     )
 
 
-__all__ = ['unknown_command']
\ No newline at end of file
+__all__ = ['unknown_command', 'with_typing', 'BUSY_TEXT']
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+handlers/document.py - Перевод файлов .txt, .srt и .csv
+
+Язык перевода - в подписи к файлу (например, "en"), без подписи - как
+в быстром переводе. Файл скачивается во временный каталог и переводится
+потоково; ход перевода показывается правкой одного сообщения.
+"""
+
+import asyncio
+import io
+import logging
+import math
+import os
+import tempfile
+import time
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from config import (
+    BATCH_MAX_TEXTS, BATCH_MAX_CHARS,
+    DOCUMENT_MAX_SIZE, DOCUMENT_CHARS_PER_USE, DOCUMENT_CONCURRENCY, DOCUMENT_PROGRESS_INTERVAL,
+    DOCUMENT_DEADLINE
+)
+from services.deadline import deadline_scope
+from services.documents import READERS, translate_units
+from services.errors import TranslatorUnavailable
+from services.inflight import inflight
+from services.langdetect import detect_language
+from services.metrics import instrument
+from services.yandex_translate import get_translator
+from handlers.common import BUSY_TEXT
+from handlers.glossary import user_glossary
+from handlers.translate_handler import quick_target
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов начала файла смотреть для определения языка перевода
+DETECT_SAMPLE = 2000
+
+# Пользователи, чьи файлы сейчас переводятся (по одному файлу на пользователя)
+_active = set()
+
+
+class _CountingReader(io.RawIOBase):
+    """Файл, считающий прочитанные байты (для прогресса)"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self.raw.readinto(buffer)
+        self.count += read or 0
+        return read
+
+
+class _Progress:
+    """Сообщение с ходом перевода: правится не чаще interval секунд"""
+
+    def __init__(self, message, total, interval=DOCUMENT_PROGRESS_INTERVAL):
+        self.message = message
+        self.total = max(total, 1)
+        self.interval = interval
+        self._shown = 0
+        self._updated = time.monotonic()
+
+    async def update(self, done):
+        percent = min(done * 100 // self.total, 99)
+        if percent <= self._shown or time.monotonic() - self._updated < self.interval:
+            return
+        self._shown = percent
+        self._updated = time.monotonic()
+        await self.set(f"Перевод файла: {percent}%")
+
+    async def set(self, text):
+        try:
+            await self.message.edit_text(text)
+        except TelegramError as e:
+            # Прогресс несрочный - ошибка правки не мешает переводу
+            logger.debug("Прогресс не обновлен", extra={"error": repr(e)})
+
+
+def _target_from_caption(caption):
+    """Код языка из подписи к файлу (None - определить автоматически)"""
+    words = (caption or "").split()
+    if words and words[0] in get_translator().languages:
+        return words[0]
+    return None
+
+
+@instrument("document_translate")
+async def document_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Перевод присланного файла с сохранением его структуры"""
+    message = update.message
+    document = message.document
+    user_id = update.effective_user.id
+    name, extension = os.path.splitext(document.file_name or "")
+    reader = READERS.get(extension.lower())
+
+    if reader is None:
+        await message.reply_text("Поддерживаются файлы .txt, .srt и .csv")
+        return
+    if document.file_size and document.file_size > DOCUMENT_MAX_SIZE:
+        await message.reply_text(f"Файл слишком большой (не больше {DOCUMENT_MAX_SIZE // 1024} КБ)")
+        return
+    if user_id in _active:
+        await message.reply_text("Дождитесь перевода предыдущего файла")
+        return
+
+    translator = get_translator()
+    # Списание по размеру файла с возвратом лишнего после перевода
+    charged = max(math.ceil((document.file_size or 0) / DOCUMENT_CHARS_PER_USE), 1)
+    if not translator.charge(user_id, charged):
+        _, limit_message = translator.can_user_translate(user_id)
+        await message.reply_text(
+            f"Недостаточно переводов для файла (нужно {charged}).\n{limit_message}".rstrip()
+        )
+        return
+
+    _active.add(user_id)
+    used = 0
+    try:
+        # Обработчик не блокирует очередь пользователя, поэтому его отмена (/cancel)
+        # регистрируется отдельно; срок - свой, дольше срока обычного обновления
+        with deadline_scope(DOCUMENT_DEADLINE, replace=True), inflight.track(user_id):
+            target_lang = _target_from_caption(message.caption)
+            progress = _Progress(await message.reply_text("Перевод файла: 0%"), document.file_size or 0)
+            glossary = user_glossary(context)
+
+            file_lang, detected = None, False
+
+            async def translate_texts(texts):
+                nonlocal target_lang, file_lang, detected
+                if not detected:
+                    detected = True
+                    # Язык файла - по его началу, один раз: по нему выбираются язык перевода
+                    # без подписи и глоссарий, а исходный язык каждого текста определяет API
+                    file_lang = detect_language("\n".join(texts)[:DETECT_SAMPLE])
+                    if target_lang is None:
+                        target_lang = quick_target(context, file_lang)
+                return await translator.translate_texts(
+                    texts, target_lang, user_glossary=glossary, source_hint=file_lang
+                )
+
+            with tempfile.TemporaryDirectory() as directory:
+                source_path = os.path.join(directory, "source")
+                result_path = os.path.join(directory, "result")
+                file = await document.get_file()
+                await file.download_to_drive(source_path)
+
+                with open(source_path, "rb") as raw:
+                    counter = _CountingReader(raw)
+                    # newline="": переводы строк файла сохраняются как есть
+                    stream = io.TextIOWrapper(io.BufferedReader(counter), encoding="utf-8-sig", newline="")
+                    with open(result_path, "w", encoding="utf-8", newline="") as result:
+
+                        async def on_pack(chars):
+                            await progress.update(counter.count)
+
+                        chars = await translate_units(
+                            reader(stream), translate_texts, result.write,
+                            max_texts=BATCH_MAX_TEXTS, max_chars=BATCH_MAX_CHARS,
+                            concurrency=DOCUMENT_CONCURRENCY, on_pack=on_pack,
+                        )
+                used = max(math.ceil(chars / DOCUMENT_CHARS_PER_USE), 1)
+
+                logger.info("Файл переведен", extra={
+                    "user_id": user_id, "format": extension.lower(), "chars": chars, "target_lang": target_lang,
+                })
+                await progress.set("Перевод файла: 100%")
+                with open(result_path, "rb") as result:
+                    await message.reply_document(result, filename=f"{name}.{target_lang or 'ru'}{extension}")
+
+    except asyncio.CancelledError:
+        # Отмена пользователем или при остановке бота: запросы к API отменены, лимит возвращается
+        used = 0
+        if not inflight.interrupted():
+            raise
+        await message.reply_text("Перевод файла отменен")
+    except UnicodeDecodeError:
+        used = 0
+        await message.reply_text("Файл должен быть в кодировке UTF-8")
+    except TranslatorUnavailable:
+        used = 0
+        await message.reply_text(BUSY_TEXT)
+    except Exception as e:
+        # Ошибки API, сети, разбора файла
+        used = 0
+        logger.warning("Ошибка перевода файла", extra={"user_id": user_id, "error": repr(e)})
+        await message.reply_text("Не удалось перевести файл. Попробуйте еще раз позже")
+    finally:
+        _active.discard(user_id)
+        translator.refund(user_id, charged - used)
+
+
+__all__ = ['document_translate']
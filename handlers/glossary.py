@@ -0,0 +1,91 @@
+"""
+handlers/glossary.py - Личный глоссарий пользователя (/glossary)
+"""
+
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from services.glossary import MAX_GLOSSARY_PAIRS, pair_key
+from services.metrics import instrument
+from services.yandex_translate import get_translator
+
+logger = logging.getLogger(__name__)
+
+GLOSSARY_HELP = (
+    "Личный глоссарий - обязательные переводы терминов.\n\n"
+    "/glossary en-ru термин = перевод - добавить термин\n"
+    "/glossary del en-ru термин - удалить термин\n"
+    "/glossary clear - очистить глоссарий\n"
+    "/glossary - показать термины"
+)
+
+
+def user_glossary(context):
+    """Термины пользователя для передачи в translate (или None)"""
+    return context.user_data.get("glossary") or None
+
+
+def _parse_pair(value):
+    """"en-ru" -> ("en", "ru") для поддерживаемых языков, иначе None"""
+    source_lang, _, target_lang = value.partition("-")
+    catalog = get_translator().languages
+    if source_lang in catalog and target_lang in catalog and source_lang != target_lang:
+        return source_lang, target_lang
+    return None
+
+
+def _render(glossary):
+    lines = ["Ваш глоссарий:"]
+    for pair, terms in sorted(glossary.items()):
+        lines.append(f"\n{pair}:")
+        lines.extend(f"{source} = {translated}" for source, translated in sorted(terms.items()))
+    return "\n".join(lines)
+
+
+@instrument("glossary_command")
+async def glossary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Просмотр и изменение личного глоссария"""
+    glossary = context.user_data.setdefault("glossary", {})
+    args = context.args or []
+
+    if not args:
+        await update.message.reply_text(_render(glossary) if glossary else GLOSSARY_HELP)
+        return
+
+    if args[0] == "clear":
+        glossary.clear()
+        await update.message.reply_text("Глоссарий очищен.")
+        return
+
+    if args[0] == "del" and len(args) >= 3 and (pair := _parse_pair(args[1])):
+        key = pair_key(*pair)
+        term = " ".join(args[2:])
+        if glossary.get(key, {}).pop(term, None) is None:
+            await update.message.reply_text("Такого термина нет в глоссарии.")
+            return
+        if not glossary[key]:
+            del glossary[key]
+        await update.message.reply_text(f"Термин удален: {term}")
+        return
+
+    # /glossary en-ru термин = перевод
+    pair = _parse_pair(args[0])
+    source, sep, translated = " ".join(args[1:]).partition("=")
+    source, translated = source.strip(), translated.strip()
+    if not pair or not sep or not source or not translated:
+        await update.message.reply_text(GLOSSARY_HELP)
+        return
+
+    terms = glossary.setdefault(pair_key(*pair), {})
+    if source not in terms and len(terms) >= MAX_GLOSSARY_PAIRS:
+        await update.message.reply_text(f"В глоссарии может быть не больше {MAX_GLOSSARY_PAIRS} терминов для пары языков.")
+        return
+    terms[source] = translated
+
+    logger.info("Термин добавлен в глоссарий", extra={"user_id": update.effective_user.id, "pair": pair_key(*pair)})
+    await update.message.reply_text(f"Добавлено: {source} = {translated}")
+
+
+__all__ = ['glossary_command', 'user_glossary']
@@ -0,0 +1,142 @@
+"""
+handlers/group.py - Автоперевод сообщений группы сводками (/autotranslate)
+
+Администратор группы включает автоперевод на выбранный язык; сообщения
+участников переводятся порциями раз в GROUP_DIGEST_INTERVAL секунд, а
+переводы собираются в одно сообщение-сводку, которое бот правит.
+Боту нужен доступ к сообщениям группы (BotFather: /setprivacy - Disable).
+"""
+
+import logging
+
+from telegram import ChatMember, Update
+from telegram.error import BadRequest
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from config import BATCH_MAX_TEXTS, BATCH_MAX_CHARS, GROUP_DIGEST_WINDOW, GROUP_DIGEST_INTERVAL, UPDATE_DEADLINE
+from services.chunking import split_text
+from services.digest import DigestBuffer
+from services.governor import PRIORITY_QUICK
+from services.langdetect import detect_language
+from services.metrics import instrument
+from services.yandex_translate import get_translator, MAX_TEXT_LENGTH
+
+logger = logging.getLogger(__name__)
+
+AUTOTRANSLATE_HELP = (
+    "Автоперевод сообщений группы сводками.\n\n"
+    "/autotranslate ru - переводить сообщения на русский\n"
+    "/autotranslate off - выключить\n\n"
+    "Включать и выключать могут администраторы группы."
+)
+
+_digests = None
+
+
+def get_digests(bot):
+    """Общий буфер сводок процесса"""
+    global _digests
+    if _digests is None:
+
+        async def translate_texts(texts, target_lang):
+            # Язык порции - только для выбора общего глоссария: язык каждого сообщения определяет API
+            return await get_translator().translate_texts(
+                texts, target_lang, priority=PRIORITY_QUICK, source_hint=detect_language("\n".join(texts))
+            )
+
+        async def publish(chat_id, target_lang, body, message):
+            text = f"Перевод ({get_translator().languages.name(target_lang)}):\n{body}"
+            if message is None:
+                return await bot.send_message(chat_id, text, disable_notification=True)
+            try:
+                await message.edit_text(text)
+            except BadRequest as e:
+                if "not modified" not in str(e):
+                    raise
+            return message
+
+        _digests = DigestBuffer(
+            translate_texts, publish,
+            window=GROUP_DIGEST_WINDOW, interval=GROUP_DIGEST_INTERVAL,
+            max_texts=BATCH_MAX_TEXTS, max_chars=BATCH_MAX_CHARS, deadline=UPDATE_DEADLINE,
+        )
+    return _digests
+
+
+async def close_digests():
+    """Публикация накопленных сводок при остановке"""
+    if _digests is not None:
+        await _digests.close()
+
+
+async def _is_admin(update):
+    message = update.message
+    # Анонимный администратор пишет от имени группы
+    if message.sender_chat is not None and message.sender_chat.id == message.chat.id:
+        return True
+    member = await message.chat.get_member(update.effective_user.id)
+    return member.status in (ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+
+
+@instrument("autotranslate_command")
+async def autotranslate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Включение и выключение автоперевода группы"""
+    chat = update.effective_chat
+    if chat.type not in (chat.GROUP, chat.SUPERGROUP):
+        await update.message.reply_text("Автоперевод включается в группе: добавьте бота в группу и отправьте там /autotranslate")
+        return
+
+    args = context.args or []
+    settings = context.application.persistence
+    current = settings.group_lang(chat.id)
+    if not args:
+        status = (
+            f"Сейчас сообщения переводятся: {get_translator().languages.name(current)}." if current
+            else "Сейчас автоперевод выключен."
+        )
+        await update.message.reply_text(f"{status}\n\n{AUTOTRANSLATE_HELP}")
+        return
+
+    if not await _is_admin(update):
+        await update.message.reply_text("Автоперевод включают и выключают администраторы группы.")
+        return
+
+    if args[0] == "off":
+        settings.set_group_lang(chat.id, None)
+        await update.message.reply_text("Автоперевод выключен.")
+        return
+
+    target_lang = args[0]
+    if target_lang not in get_translator().languages:
+        await update.message.reply_text(f"Неизвестный язык: {target_lang}\n\n{AUTOTRANSLATE_HELP}")
+        return
+
+    settings.set_group_lang(chat.id, target_lang)
+    logger.info("Автоперевод группы включен", extra={"chat_id": chat.id, "target_lang": target_lang})
+    await update.message.reply_text(
+        f"Автоперевод включен: {get_translator().languages.name(target_lang)}. "
+        f"Переводы будут появляться сводкой раз в {GROUP_DIGEST_INTERVAL:g} с."
+    )
+
+
+async def group_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Сообщение группы с автопереводом - в сводку, без отдельного ответа.
+    В группах без автоперевода сообщение обрабатывается как обычно
+    """
+    target_lang = context.application.persistence.group_lang(update.effective_chat.id)
+    if not target_lang:
+        return
+
+    message = update.message
+    text = message.text
+    if len(text) > MAX_TEXT_LENGTH:
+        # В сводку - только начало длинного сообщения
+        text = split_text(text, MAX_TEXT_LENGTH)[0][0] + " …"
+    author = message.sender_chat.title if message.sender_chat else message.from_user.first_name
+
+    get_digests(context.bot).add(message.chat.id, target_lang, author, text)
+    raise ApplicationHandlerStop
+
+
+__all__ = ['autotranslate_command', 'group_message', 'close_digests', 'get_digests']
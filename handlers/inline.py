@@ -0,0 +1,147 @@
+"""
+handlers/inline.py - Inline-режим: перевод прямо в строке ввода (@бот текст)
+
+Запрос переводится после паузы в наборе (INLINE_DEBOUNCE); новый запрос
+пользователя отменяет предыдущий вместе с его переводом. Показ вариантов
+лимит не списывает - перевод засчитывается, когда пользователь выбрал
+результат (chosen_inline_result, включается в BotFather: /setinlinefeedback).
+"""
+
+import asyncio
+import hashlib
+import logging
+
+from telegram import InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent, Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from config import INLINE_DEBOUNCE, INLINE_CACHE_TIME
+from services.errors import TranslatorUnavailable
+from services.governor import PRIORITY_INTERACTIVE
+from services.langdetect import detect_language
+from services.log import text_fields
+from services.metrics import instrument
+from services.yandex_translate import get_translator, MAX_TEXT_LENGTH
+from handlers.glossary import user_glossary
+from handlers.translate_handler import quick_target
+
+logger = logging.getLogger(__name__)
+
+# Выполняющийся inline-запрос каждого пользователя
+_pending = {}
+
+
+def _parse_query(text, context):
+    """
+    Язык перевода, текст и его язык: "en: привет" - на английский,
+    без префикса - как в быстром переводе. Язык текста известен, только
+    если детектор уверен, иначе его определяет API (None)
+    """
+    prefix, sep, rest = text.partition(":")
+    if sep and rest.strip() and prefix.strip() in get_translator().languages:
+        return prefix.strip(), rest.strip(), None
+    source_lang = detect_language(text)
+    return quick_target(context, source_lang), text, source_lang
+
+
+def _result_id(target_lang, text):
+    """Короткий id результата (Telegram ограничивает его 64 байтами)"""
+    return hashlib.blake2b(f"{target_lang}:{text}".encode(), digest_size=16).hexdigest()
+
+
+@instrument("inline_query")
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE, debounce=INLINE_DEBOUNCE):
+    """
+    Перевод inline-запроса (обработчик не блокирует очередь пользователя).
+    debounce - пауза в наборе перед переводом (0 - сразу, для webhook)
+    """
+    query = update.inline_query
+    user_id = query.from_user.id
+    text = query.query.strip()
+
+    # Новый запрос заменяет предыдущий: его перевод больше не нужен
+    previous = _pending.pop(user_id, None)
+    if previous is not None:
+        previous.cancel()
+    if not text:
+        return
+
+    task = asyncio.current_task()
+    _pending[user_id] = task
+    try:
+        if debounce:
+            # Пользователь еще печатает - ждем паузы
+            await asyncio.sleep(debounce)
+        await _answer(query, user_id, text, context)
+    except asyncio.CancelledError:
+        if _pending.get(user_id) is task:
+            # Отмена не новым запросом (остановка бота)
+            raise
+        logger.debug("Inline-запрос заменен новым", extra={"user_id": user_id})
+    finally:
+        if _pending.get(user_id) is task:
+            del _pending[user_id]
+
+
+async def _answer(query, user_id, text, context):
+    translator = get_translator()
+
+    can_translate, _ = translator.can_user_translate(user_id)
+    if not can_translate:
+        await _safe_answer(query, [], cache_time=0, is_personal=True, button=InlineQueryResultsButton(
+            "Лимит переводов на сегодня исчерпан", start_parameter="limit",
+        ))
+        return
+
+    if len(text) > MAX_TEXT_LENGTH:
+        await _safe_answer(query, [], cache_time=0, is_personal=True)
+        return
+
+    target_lang, text, source_lang = _parse_query(text, context)
+    glossary = user_glossary(context)
+
+    try:
+        # Лимит списывается при выборе результата (chosen_inline_result)
+        translated = await translator.translate(
+            text, target_lang=target_lang, priority=PRIORITY_INTERACTIVE,
+            source_lang=source_lang, user_glossary=glossary,
+        )
+    except TranslatorUnavailable as e:
+        logger.warning("Перевод недоступен", extra={"user_id": user_id, "reason": type(e).__name__})
+        translated = None
+
+    if not translated:
+        # Без кэша в Telegram: следующий такой же запрос попробует снова
+        await _safe_answer(query, [], cache_time=0, is_personal=True)
+        return
+
+    logger.info("Inline-перевод", extra={"user_id": user_id, "target_lang": target_lang, **text_fields(text)})
+    result = InlineQueryResultArticle(
+        id=_result_id(target_lang, text),
+        title=f"Перевод ({translator.languages.name(target_lang)})",
+        description=translated[:100],
+        input_message_content=InputTextMessageContent(translated),
+    )
+    # Перевод с личным глоссарием или на выбранный пользователем язык
+    # Telegram не показывает другим пользователям
+    personal = bool(glossary) or bool(context.user_data.get("target_lang"))
+    await _safe_answer(query, [result], cache_time=INLINE_CACHE_TIME, is_personal=personal)
+
+
+async def _safe_answer(query, results, **kwargs):
+    """Ответ на inline-запрос; устаревший запрос Telegram отклоняет - это не ошибка"""
+    try:
+        await query.answer(results, **kwargs)
+    except TelegramError as e:
+        logger.debug("Ответ на inline-запрос не принят", extra={"error": repr(e)})
+
+
+@instrument("chosen_inline_result")
+async def chosen_inline_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Пользователь отправил перевод - списание лимита"""
+    user_id = update.chosen_inline_result.from_user.id
+    if not get_translator().charge(user_id):
+        logger.info("Inline-перевод сверх лимита", extra={"user_id": user_id})
+
+
+__all__ = ['inline_query', 'chosen_inline_result']
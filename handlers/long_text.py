@@ -0,0 +1,111 @@
+"""
+handlers/long_text.py - Перевод длинных текстов частями с постепенным выводом
+"""
+
+import asyncio
+import time
+from contextlib import aclosing
+
+from telegram.error import BadRequest
+
+from config import LONG_TEXT_DEADLINE
+from handlers.common import BUSY_TEXT
+from services.deadline import deadline_scope
+from services.chunking import split_message
+from services.errors import QuotaExceededError, TranslatorUnavailable
+from services.yandex_translate import get_translator
+
+# Не чаще одного редактирования сообщения в секунду (ограничение Telegram)
+EDIT_INTERVAL = 1.0
+
+
+async def _edit(message, text):
+    """Редактирование с пропуском ошибки "сообщение не изменилось\""""
+    try:
+        await message.edit_text(text)
+    except BadRequest as e:
+        if "not modified" not in str(e):
+            raise
+
+
+async def reply_long_translation(
+    message, text, target_lang, header, user_id, priority, source_lang=None, user_glossary=None
+):
+    """
+    Перевод длинного текста: части переводятся параллельно, а ответ
+    дописывается по мере готовности и при необходимости делится
+    на несколько сообщений по 4096 символов. Срок - LONG_TEXT_DEADLINE
+    вместо срока обычного сообщения
+    """
+    translator = get_translator()
+    chunks = translator.split_long_text(text)
+    status = await message.reply_text(f"{header}\n\nПереводится длинный текст ({len(chunks)} ч.)...")
+
+    # Отправленные сообщения ответа и их текущий текст
+    sent = [[status, status.text]]
+    parts = []
+    failed = 0
+    last_edit = 0.0
+
+    async def render(final):
+        body = header + "\n\n" + "".join(parts)
+        if not final:
+            body += " …"
+        elif failed:
+            body += f"\n\n(не удалось перевести частей: {failed}, оставлен исходный текст)"
+
+        for index, page in enumerate(split_message(body)):
+            if index < len(sent):
+                if sent[index][1] != page:
+                    await _edit(sent[index][0], page)
+                    sent[index][1] = page
+            else:
+                sent.append([await message.reply_text(page), page])
+
+    try:
+        index = 0
+        # aclosing: при отмене недопереведенные части сразу отменяются и возвращаются в лимит
+        with deadline_scope(LONG_TEXT_DEADLINE, replace=True):
+            async with aclosing(translator.translate_chunks(
+                chunks, target_lang=target_lang, user_id=user_id, priority=priority,
+                source_lang=source_lang, user_glossary=user_glossary,
+            )) as translations:
+                async for translated, separator in translations:
+                    if translated is None:
+                        failed += 1
+                        translated = chunks[index][0]
+                    parts.append(translated + separator)
+                    index += 1
+
+                    if index < len(chunks) and time.monotonic() - last_edit >= EDIT_INTERVAL:
+                        await render(final=False)
+                        last_edit = time.monotonic()
+
+        await render(final=True)
+
+    except QuotaExceededError:
+        usage = translator.get_user_usage(user_id)
+        await _edit(
+            status,
+            f"Для перевода этого текста нужно {len(chunks)} переводов, "
+            f"а осталось {usage['remaining']}.\n"
+            f"Используйте /status для проверки."
+        )
+    except TranslatorUnavailable:
+        await _finish(status, parts, render, BUSY_TEXT)
+    except asyncio.CancelledError:
+        # /cancel: готовая часть перевода остается в сообщении
+        await _finish(status, parts, render, "Перевод отменен.")
+        raise
+
+
+async def _finish(status, parts, render, note):
+    """Завершение прерванного перевода: готовая часть и пояснение"""
+    if parts:
+        parts.append(f"\n\n{note}")
+        await render(final=True)
+    else:
+        await _edit(status, note)
+
+
+__all__ = ['reply_long_translation']
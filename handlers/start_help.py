@@ -2,9 +2,16 @@
 handlers/start_help.py - Обработчики команд /start и /help
 """
 
+import logging
+
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from services.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+@instrument("start_command")
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обработчик команды /start при запуске бота пользователем
@@ -34,9 +41,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     
     # Отправляем сообщение пользователю
     await update.message.reply_text(welcome_text)
-    print(f"Пользователь {user.first_name} запустил бота")
+    logger.info("Пользователь запустил бота", extra={"user_id": user.id})
 
 
+@instrument("help_command")
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Справка"""
     help_text = """
@@ -48,6 +56,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         /languages - Показать список языков
         /cancel - Отменить текущий перевод
         /status - Узнать лимит переводов (доступно 20 в день)
+        /glossary - Личный глоссарий терминов
+        /autotranslate - Автоперевод сообщений группы (в группе)
 
         Использование:
 
@@ -59,6 +69,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         2. Для быстрого перевода на русский:
         - Просто отправьте любой текст
         - Бот автоматически переведет его
+        (текст на русском - на английский)
 
         Поддерживаемые языки: русский, английский, испанский, французский, немецкий, итальянский и другие.
     """
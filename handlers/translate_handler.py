@@ -2,25 +2,103 @@
 handlers/translate_handler.py - Простой обработчик перевода
 """
 
+import logging
+import time
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
 
-from services.yandex_translate import translator
+from config import ADMIN_IDS, QUICK_STORE_SIZE, CONVERSATION_TIMEOUT
+from services.errors import TranslatorUnavailable
+from services.governor import PRIORITY_INTERACTIVE, PRIORITY_QUICK
+from services.langdetect import detect_language
+from services.languages import RECENT_LANGUAGES
+from services.log import text_fields
+from services import metrics
+from services.metrics import instrument
+from services.recent_texts import RecentTextStore
+from services.yandex_translate import get_translator, MAX_TEXT_LENGTH
+from handlers.common import BUSY_TEXT, with_typing
+from handlers.glossary import user_glossary
+from handlers.long_text import reply_long_translation
+
+logger = logging.getLogger(__name__)
 
 # Состояния для диалога
 WAITING_FOR_LANGUAGE = 1
 WAITING_FOR_TEXT = 2
 
+# Языки кнопок быстрого перевода
+QUICK_LANGUAGES = {
+    "ru": "русский",
+    "en": "английский",
+    "es": "испанский",
+}
+
+# Язык быстрого перевода для текстов на этих языках (остальные - на русский)
+AUTO_TARGETS = {
+    "ru": "en",
+}
+
+
+
+def quick_target(context, source_lang):
+    """
+    Язык быстрого перевода: последний выбранный пользователем,
+    а для текста на нем самом - по AUTO_TARGETS
+    """
+    preferred = context.user_data.get("target_lang")
+    if preferred and preferred != source_lang:
+        return preferred
+    return AUTO_TARGETS.get(source_lang, "ru")
+
+
+# Исходные тексты ответов быстрого перевода для кнопок
+quick_texts = RecentTextStore(max_entries=QUICK_STORE_SIZE)
+
+
+# Кнопки перевода на остальные языки (одни и те же для всех ответов)
+QUICK_KEYBOARDS = {
+    current_lang: InlineKeyboardMarkup([[
+        InlineKeyboardButton(f"На {name}", callback_data=f"quick_{code}")
+        for code, name in QUICK_LANGUAGES.items()
+        if code != current_lang
+    ]])
+    for current_lang in [*QUICK_LANGUAGES, None]
+}
+
+
+def _quick_keyboard(current_lang):
+    """Кнопки перевода на остальные языки"""
+    return QUICK_KEYBOARDS.get(current_lang, QUICK_KEYBOARDS[None])
+
+
+def _quick_name(lang_code):
+    """Название языка в ответе быстрого перевода ("Перевод на ...")"""
+    return QUICK_LANGUAGES.get(lang_code) or get_translator().languages.name(lang_code).lower()
+
+
+def _quick_response(lang_code, translated, source_text):
+    """Текст ответа быстрого перевода"""
+    return (
+        f"Перевод на {_quick_name(lang_code)}:\n\n"
+        f"{translated}\n\n"
+        f"Исходный текст:\n"
+        f"{source_text}"
+    )
+
+@instrument("start_translate_command")
 async def start_translate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /translate"""
     
     user = update.effective_user
     user_id = user.id
 
-    print(f"Пользователь {user.first_name} начал перевод")
+    logger.info("Начат перевод", extra={"user_id": user_id})
 
     # Проверка лимита пользователя
-    can_translate, error = translator.can_user_translate(user_id)
+    can_translate, error = get_translator().can_user_translate(user_id)
     if not can_translate:
         await update.message.reply_text(
             f"Превышен дневной лимит: {error}\n"
@@ -28,34 +106,19 @@ async def start_translate_command(update: Update, context: ContextTypes.DEFAULT_
         )
         return ConversationHandler.END
     
-    # Список языков
-    languages = translator.get_languages()
-    
-    # Создание кнопок
-    keyboard = []
-    
-    # Часто используемые языки
-    popular_languages = ["ru", "en", "es", "fr", "de", "it"]
-    
-    for lang_code in popular_languages:
-        if lang_code in languages:
-            lang_name = languages[lang_code]
-            button = InlineKeyboardButton(lang_name, callback_data=f"lang_{lang_code}")
-            keyboard.append([button])
-    
-    # Кнопка отмены
-    keyboard.append([InlineKeyboardButton("Отмена", callback_data="cancel")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
+    # Готовая клавиатура каталога языков (недавние языки пользователя - первыми)
+    catalog = get_translator().languages
+    catalog.maybe_refresh()
+
     await update.message.reply_text(
         "Выберите язык для перевода:",
-        reply_markup=reply_markup
+        reply_markup=catalog.keyboard(0, context.user_data.get("recent_langs", ()))
     )
     
     return WAITING_FOR_LANGUAGE
 
 
+@instrument("language_selected")
 async def language_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка выбор языка"""
     query = update.callback_query
@@ -66,17 +129,31 @@ async def language_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Перевод отменен")
         return ConversationHandler.END
     
+    catalog = get_translator().languages
+    recent = context.user_data.get("recent_langs", [])
+
+    # Переход на другую страницу списка языков
+    if query.data.startswith("langpage_"):
+        page = int(query.data.split("_", 1)[1])
+        try:
+            await query.edit_message_reply_markup(reply_markup=catalog.keyboard(page, recent))
+        except BadRequest as e:
+            # Нажата кнопка с номером текущей страницы
+            if "not modified" not in str(e):
+                raise
+        return WAITING_FOR_LANGUAGE
+
     # Получение кода языка
     if query.data.startswith("lang_"):
-        lang_code = query.data.split("_")[1]
-        languages = translator.get_languages()
-        lang_name = languages.get(lang_code, lang_code)
+        lang_code = query.data.split("_", 1)[1]
+        lang_name = catalog.name(lang_code)
         
-        # Сохранение в контекст
+        # Сохранение в контекст (язык запоминается и для быстрого перевода)
         context.user_data["target_lang"] = lang_code
-        context.user_data["lang_name"] = lang_name
+        context.user_data["dialog_at"] = time.monotonic()
+        context.user_data["recent_langs"] = ([lang_code] + [code for code in recent if code != lang_code])[:RECENT_LANGUAGES]
         
-        print(f"Выбран язык: {lang_code} ({lang_name})")
+        logger.info("Выбран язык", extra={"user_id": update.effective_user.id, "target_lang": lang_code})
         
         await query.edit_message_text(
             f"Выбран язык: {lang_name}\n\n"
@@ -86,20 +163,52 @@ async def language_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return WAITING_FOR_TEXT
 
 
+@instrument("process_text")
 async def process_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка введенного текста"""
     user_text = update.message.text
     target_lang = context.user_data.get("target_lang", "ru")
-    lang_name = context.user_data.get("lang_name", "Русский")
+    lang_name = get_translator().languages.name(target_lang)
     user_id = update.effective_user.id
+
+    # Диалог давно простаивает - сообщение переводится как обычное
+    started = context.user_data.pop("dialog_at", None)
+    if started is not None and time.monotonic() - started > CONVERSATION_TIMEOUT:
+        await quick_translate(update, context)
+        return ConversationHandler.END
     
-    print(f"Перевод текста: '{user_text[:50]}...' на {target_lang}")
-    
-    # Типо печатает
-    await update.message.chat.send_action(action="typing")
+    source_lang = detect_language(user_text)
+
+    logger.info("Перевод текста", extra={
+        "user_id": user_id, "source_lang": source_lang, "target_lang": target_lang, **text_fields(user_text)
+    })
 
-    #Передача user_id при вызове translate
-    translated = translator.translate(user_text, target_lang=target_lang, user_id=user_id)
+    # Текст уже на выбранном языке - переводить нечего
+    if source_lang == target_lang:
+        await update.message.reply_text(
+            f"Текст уже написан на выбранном языке ({lang_name}).\n"
+            f"Для нового перевода: /translate"
+        )
+        return ConversationHandler.END
+
+    # Длинный текст переводится частями
+    if len(user_text) > MAX_TEXT_LENGTH:
+        await reply_long_translation(
+            update.message, user_text, target_lang, f"Перевод на {lang_name}:",
+            user_id, PRIORITY_INTERACTIVE, source_lang, user_glossary(context),
+        )
+        return ConversationHandler.END
+
+    #Передача user_id при вызове translate ("печатает" - только если перевода нет в кэше)
+    try:
+        translated = await with_typing(update.message.chat, get_translator().translate(
+            user_text, target_lang=target_lang, user_id=user_id,
+            priority=PRIORITY_INTERACTIVE, source_lang=source_lang,
+            user_glossary=user_glossary(context),
+        ))
+    except TranslatorUnavailable:
+        await update.message.reply_text(BUSY_TEXT)
+        return ConversationHandler.END
     
     if translated:
         response = (
@@ -119,14 +228,16 @@ async def process_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@instrument("cancel_translate")
 async def cancel_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отмена перевода"""
     await update.message.reply_text("Перевод отменен.")
     return ConversationHandler.END
 
 
+@instrument("quick_translate")
 async def quick_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Перевод на русский без определения языка"""
+    """Перевод на русский (русского текста - на английский) с локальным определением языка"""
     user_text = update.message.text
     user_id = update.effective_user.id
     
@@ -134,85 +245,125 @@ async def quick_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_text.startswith('/'):
         return
     
-    print(f"Быстрый перевод: '{user_text[:50]}...'")
-    
-    await update.message.chat.send_action(action="typing")
+    source_lang = detect_language(user_text)
+    target_lang = quick_target(context, source_lang)
 
-    #Передача user_id при вызове translate
-    translated = translator.translate(user_text, target_lang="ru", user_id=user_id)
+    logger.info("Быстрый перевод", extra={
+        "user_id": user_id, "source_lang": source_lang, "target_lang": target_lang, **text_fields(user_text)
+    })
+
+    # Длинный текст переводится частями
+    if len(user_text) > MAX_TEXT_LENGTH:
+        await reply_long_translation(
+            update.message, user_text, target_lang, f"Перевод на {_quick_name(target_lang)}:",
+            user_id, PRIORITY_QUICK, source_lang, user_glossary(context),
+        )
+        return
     
-    # Перевод на русский
-    translated = translator.translate(user_text, target_lang="ru")
+    # Один запрос к API на сообщение
+    try:
+        translated = await with_typing(update.message.chat, get_translator().translate(
+            user_text, target_lang=target_lang, user_id=user_id,
+            priority=PRIORITY_QUICK, source_lang=source_lang,
+            user_glossary=user_glossary(context),
+        ))
+    except TranslatorUnavailable:
+        await update.message.reply_text(BUSY_TEXT)
+        return
     
     if translated:
-        # Создание кнопок
-        keyboard = [
-            [
-                InlineKeyboardButton("На английский", callback_data=f"quick_en"),
-                InlineKeyboardButton("На испанский", callback_data=f"quick_es")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        response = (
-            f"Перевод на русский:\n\n"
-            f"{translated}\n\n"
-            f"Исходный текст:\n"
-            f"{user_text}"
+        reply = await update.message.reply_text(
+            _quick_response(target_lang, translated, user_text),
+            reply_markup=_quick_keyboard(target_lang),
         )
-        
-        await update.message.reply_text(response, reply_markup=reply_markup)
+        # Исходный текст нужен кнопкам перевода на другие языки
+        quick_texts.put(reply.chat_id, reply.message_id, user_text)
     else:
         await update.message.reply_text(
             "Не удалось перевести текст. Попробуйте команду /translate"
         )
 
 
+@instrument("handle_quick_button")
 async def handle_quick_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка кнопок"""
+    """Обработка кнопок: перевод того же текста на другой язык в том же сообщении"""
     query = update.callback_query
+    lang_code = query.data.split("_", 1)[1]
+    source_text = quick_texts.get(query.message.chat_id, query.message.message_id)
+
+    # Текст уже вытеснен из памяти (или бот перезапускался)
+    if source_text is None or lang_code not in QUICK_LANGUAGES:
+        await query.answer()
+        await query.edit_message_text(
+            "Для перевода на другие языки используйте команду /translate"
+        )
+        return
+
+    try:
+        translated = await get_translator().translate(
+            source_text, target_lang=lang_code, user_id=update.effective_user.id,
+            priority=PRIORITY_QUICK, user_glossary=user_glossary(context),
+        )
+    except TranslatorUnavailable:
+        await query.answer(BUSY_TEXT, show_alert=True)
+        return
+
+    if not translated:
+        await query.answer("Не удалось перевести текст", show_alert=True)
+        return
+
+    # Выбранный язык становится языком быстрого перевода
+    context.user_data["target_lang"] = lang_code
+
     await query.answer()
-    
-    await query.edit_message_text(
-        "Для перевода на другие языки используйте команду /translate"
-    )
+    try:
+        await query.edit_message_text(
+            _quick_response(lang_code, translated, source_text),
+            reply_markup=_quick_keyboard(lang_code),
+        )
+    except BadRequest as e:
+        # Нажата кнопка текущего языка - сообщение не изменилось
+        if "not modified" not in str(e):
+            raise
 
 
+@instrument("show_languages_command")
 async def show_languages_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Список языков"""
-    languages = translator.get_languages()
-    
-    languages_text = "Поддерживаемые языки:\n\n"
-    
-    for code, name in languages.items():
-        languages_text += f"{name} ({code})\n"
-    
-    await update.message.reply_text(languages_text)
+    catalog = get_translator().languages
+    catalog.maybe_refresh()
+
+    # Текст готовится один раз для каждой версии каталога
+    for text in catalog.list_messages:
+        await update.message.reply_text(text)
 
+@instrument("status_command")
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Статус лимита для пользователя"""
     user_id = update.effective_user.id
     
     # Получение информации об использовании
-    usage = translator.get_user_usage(user_id)
+    usage = get_translator().get_user_usage(user_id)
     
     status_text = (
         f"Ваш статус использования:\n\n"
         f"Использовано переводов сегодня: {usage['used']} из {usage['limit']}\n"
         f"Осталось переводов: {usage['remaining']}\n\n"
         f"Лимит: {usage['limit']} переводов в день\n"
-        f"Максимальная длина текста: 1000 символов"
+        f"Тексты длиннее {MAX_TEXT_LENGTH} символов переводятся частями, "
+        f"каждая часть считается отдельным переводом"
     )
     
     await update.message.reply_text(status_text)
 
 
+@instrument("reset_command")
 async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Сброс счетчика для тестов"""
     user_id = update.effective_user.id
     
     # Сброс счетчика
-    success = translator.reset_user(user_id)
+    success = get_translator().reset_user(user_id)
     
     if success:
         await update.message.reply_text(
@@ -223,4 +374,38 @@ async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "У вас еще не было переводов сегодня.\n"
             "Счетчик уже на нуле."
-        )
\ No newline at end of file
+        )
+
+
+@instrument("budget_command")
+async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Использование бюджета API (только для администраторов)"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("Команда доступна только администраторам.")
+        return
+
+    usage = get_translator().governor.usage()
+    daily = usage["daily_chars"] or "без ограничения"
+
+    budget_text = (
+        f"Бюджет API:\n\n"
+        f"Символов сегодня: {usage['day_chars']} из {daily}\n"
+        f"Запросов в очереди: {usage['queue']} из {usage['max_queue']}\n"
+        f"Доступно сейчас: {usage['requests_available']} запросов, {usage['chars_available']} символов"
+    )
+
+    await update.message.reply_text(budget_text)
+
+
+@instrument("metrics_command")
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выгрузка метрик в формате Prometheus (только для администраторов)"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("Команда доступна только администраторам.")
+        return
+
+    # Полная выгрузка не помещается в сообщение - отправляется файлом
+    await update.message.reply_document(
+        document=metrics.render().encode(),
+        filename="metrics.txt",
+    )
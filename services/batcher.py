@@ -0,0 +1,140 @@
+"""
+services/batcher.py - Объединение одновременных переводов в один запрос к API
+"""
+
+import asyncio
+
+from services.deadline import deadline_scope
+from services.errors import TranslateApiError
+
+
+class _Batch:
+    """Тексты, ожидающие отправки с одним языком перевода"""
+
+    __slots__ = ("key", "texts", "futures", "chars", "timer")
+
+    def __init__(self, key):
+        self.key = key
+        self.texts = []
+        self.futures = []
+        self.chars = 0
+        self.timer = None
+
+
+class TranslationBatcher:
+    """
+    Собирает тексты, пришедшие в течение короткого окна, и отправляет
+    их одним запросом для каждого сочетания (язык перевода, исходный язык, приоритет,
+    глоссарий). Срочные тексты не попадают в большие фоновые пачки и не ждут их ответа
+
+    send_batch - корутина (texts, target_lang, source_lang, priority, glossary) -> список переводов
+    """
+
+    def __init__(self, send_batch, window=0.02, max_texts=100, max_chars=10000):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        self._pending = {}
+        self._tasks = set()
+
+    async def submit(self, text, target_lang, source_lang=None, priority=0, glossary=None):
+        """Добавление текста в пачку и ожидание его перевода"""
+        key = (target_lang, source_lang, priority, glossary)
+        batch = self._pending.get(key)
+
+        # Текущая пачка переполнится - отправляем ее сразу
+        if batch is not None and (
+            len(batch.texts) >= self.max_texts
+            or batch.chars + len(text) > self.max_chars
+        ):
+            self._flush(batch)
+            batch = None
+
+        if batch is None:
+            batch = self._pending[key] = _Batch(key)
+            loop = asyncio.get_running_loop()
+            batch.timer = loop.call_later(self.window, self._flush, batch)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.chars += len(text)
+
+        if len(batch.texts) >= self.max_texts:
+            self._flush(batch)
+
+        return await future
+
+    def _flush(self, batch):
+        """Отправка пачки в фоновой задаче"""
+        if self._pending.get(batch.key) is batch:
+            del self._pending[batch.key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+
+        # Тексты, которые уже никто не ждет, не отправляются
+        waiting = [(text, future) for text, future in zip(batch.texts, batch.futures) if not future.done()]
+        if not waiting:
+            return
+        texts = [text for text, _ in waiting]
+        futures = [future for _, future in waiting]
+
+        task = asyncio.create_task(self._send(batch.key, texts, futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._cancel_when_abandoned(task, futures)
+
+    @staticmethod
+    def _cancel_when_abandoned(task, futures):
+        """Запрос отменяется, когда все ожидающие его перевода отменены (/cancel, срок)"""
+        waiting = len(futures)
+
+        def on_done(future):
+            nonlocal waiting
+            if future.cancelled():
+                waiting -= 1
+                if not waiting:
+                    task.cancel()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    async def _send(self, key, texts, futures):
+        """Отправка запроса и раздача результатов ожидающим"""
+        target_lang, source_lang, priority, glossary = key
+        try:
+            # Пачка общая: срок обработки того, кто ее открыл, к ней не относится
+            with deadline_scope(None, replace=True):
+                results = await self.send_batch(texts, target_lang, source_lang, priority, glossary)
+            if len(results) != len(texts):
+                raise TranslateApiError(200, "число переводов не совпадает с числом текстов")
+        except TranslateApiError as e:
+            # Неверный запрос: делим пачку пополам, чтобы один плохой текст не испортил остальные
+            if e.status_code == 400 and len(texts) > 1:
+                middle = len(texts) // 2
+                await asyncio.gather(
+                    self._send(key, texts[:middle], futures[:middle]),
+                    self._send(key, texts[middle:], futures[middle:]),
+                )
+            else:
+                self._fail(futures, e)
+            return
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            self._fail(futures, e)
+            return
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(futures, error):
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
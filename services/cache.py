@@ -0,0 +1,166 @@
+"""
+services/cache.py - Кэш готовых переводов (память + SQLite)
+"""
+
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+
+from services.sqlite_store import SqliteWriteBehind
+
+# Примерные накладные расходы на одну запись в памяти, байт
+_ENTRY_OVERHEAD = 120
+
+
+def normalize_text(text):
+    """Приведение текста к виду для ключа кэша"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def make_key(text, target_lang, source_lang=None, variant=""):
+    """Ключ кэша: нормализованный текст + языки (+ вариант, например глоссарий)"""
+    source = source_lang or ""
+    if variant:
+        source = f"{source}#{variant}"
+    return f"{target_lang}|{source}|{normalize_text(text)}"
+
+
+class MemoryCache:
+    """LRU-кэш с ограничением по числу записей, объему и времени жизни"""
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=86400):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, size = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.size_bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = len(key.encode()) + len(value.encode()) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size_bytes -= old[2]
+
+        self._data[key] = (value, time.monotonic() + self.ttl, size)
+        self.size_bytes += size
+
+        # Вытеснение самых старых записей
+        while len(self._data) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (_, _, old_size) = self._data.popitem(last=False)
+            self.size_bytes -= old_size
+            self.evictions += 1
+
+
+class SqliteCache:
+    """Постоянный кэш на диске, переживает перезапуски"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS translations (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, ttl=7 * 86400, flush_interval=1.0):
+        self.ttl = ttl
+        self.db = SqliteWriteBehind(path, self.SCHEMA, flush_interval=flush_interval)
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        rows = self.db.query(
+            "SELECT value FROM translations WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        )
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return rows[0][0]
+
+    def put(self, key, value):
+        self.db.execute_later(
+            "INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + self.ttl),
+        )
+
+    def close(self):
+        self.db.close()
+
+
+class TranslationCache:
+    """Двухуровневый кэш: сначала память, затем диск"""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    async def get(self, text, target_lang, source_lang=None, variant=""):
+        key = make_key(text, target_lang, source_lang, variant)
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+
+        # Чтение с диска не блокирует цикл событий
+        value = await asyncio.to_thread(self.disk.get, key)
+        if value is not None:
+            self.memory.put(key, value)
+        return value
+
+    def put(self, text, target_lang, value, source_lang=None, variant=""):
+        key = make_key(text, target_lang, source_lang, variant)
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений"""
+        stats = {
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size_bytes,
+            "memory_hits": self.memory.hits,
+            "memory_misses": self.memory.misses,
+            "memory_evictions": self.memory.evictions,
+            "memory_expirations": self.memory.expirations,
+        }
+        if self.disk is not None:
+            stats["disk_hits"] = self.disk.hits
+            stats["disk_misses"] = self.disk.misses
+        return stats
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,64 @@
+"""
+services/chunking.py - Деление длинного текста на части по границам абзацев и предложений
+"""
+
+import re
+
+# Лимит длины сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_LINE = re.compile(r"\n")
+_SENTENCE = re.compile(r"(?<=[.!?…。！？;])\s+")
+_SPACE = re.compile(r"\s+")
+
+
+def _last_boundary(pattern, text, start, end, min_end):
+    """Последний разделитель в text[start:end], после которого часть не короче min_end"""
+    last = None
+    for match in pattern.finditer(text, start, end):
+        if match.start() >= min_end:
+            last = match
+    return last
+
+
+def split_text(text, max_chars, patterns=(_PARAGRAPH, _SENTENCE, _SPACE)):
+    """
+    Деление текста на части не длиннее max_chars.
+    Возвращает список (часть, разделитель): склейка всех частей с их
+    разделителями дает исходный текст. Предпочтение отдается границам
+    из patterns по порядку; если подходящей нет, текст режется по длине
+    """
+    chunks = []
+    pos = 0
+    length = len(text)
+
+    while length - pos > max_chars:
+        end = pos + max_chars
+        boundary = None
+
+        # Сначала ищем крупную границу во второй половине окна, затем любую
+        for min_end in (pos + max_chars // 2, pos + 1):
+            for pattern in patterns:
+                boundary = _last_boundary(pattern, text, pos, end, min_end)
+                if boundary is not None:
+                    break
+            if boundary is not None:
+                break
+
+        if boundary is None:
+            chunks.append((text[pos:end], ""))
+            pos = end
+        else:
+            chunks.append((text[pos:boundary.start()], boundary.group()))
+            pos = boundary.end()
+
+    if pos < length:
+        chunks.append((text[pos:], ""))
+    return chunks
+
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Деление ответа на сообщения Telegram, по возможности по строкам"""
+    chunks = split_text(text, limit, patterns=(_PARAGRAPH, _LINE, _SENTENCE, _SPACE))
+    return [chunk for chunk, _ in chunks if chunk.strip()]
@@ -0,0 +1,72 @@
+"""
+services/deadline.py - Срок обработки обновления
+
+Срок задается при получении обновления и передается через contextvar во все
+вызовы внутри него (и в созданные из него задачи): проверку лимита, кэш,
+очередь к API, HTTP-запрос и повторы. Ожидание, не успевающее к сроку,
+прерывается DeadlineExceededError.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from services import metrics
+from services.errors import DeadlineExceededError
+
+# Момент (time.monotonic), к которому работа должна закончиться; None - без срока
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+DEADLINES_EXCEEDED = metrics.counter("bot_deadline_exceeded_total", "Работа, прерванная по сроку обработки")
+
+
+@contextmanager
+def deadline_scope(seconds, replace=False):
+    """
+    Срок seconds секунд на выполнение блока. Внешний срок, если он раньше,
+    сохраняется; replace=True заменяет его (None - снять срок)
+    """
+    new = None if seconds is None else time.monotonic() + seconds
+    current = _deadline.get()
+    if not replace and current is not None and (new is None or current < new):
+        new = current
+    token = _deadline.set(new)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Сколько секунд осталось до срока (None - срока нет)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def check_deadline():
+    """DeadlineExceededError, если срок уже прошел"""
+    if remaining() == 0:
+        DEADLINES_EXCEEDED.inc()
+        raise DeadlineExceededError("Срок обработки истек")
+
+
+@asynccontextmanager
+async def deadline_limit():
+    """Ожидание внутри блока прерывается, когда наступает срок"""
+    left = remaining()
+    if left is None:
+        yield
+        return
+    check_deadline()
+    try:
+        async with asyncio.timeout(left):
+            yield
+    except TimeoutError as e:
+        DEADLINES_EXCEEDED.inc()
+        raise DeadlineExceededError("Срок обработки истек") from e
+
+
+__all__ = ['deadline_scope', 'deadline_limit', 'remaining', 'check_deadline']
@@ -0,0 +1,199 @@
+"""
+services/digest.py - Сводки перевода сообщений группового чата
+
+Сообщения чата копятся и раз в interval секунд переводятся одним запросом
+к API; переводы дописываются в одно сообщение-сводку, которое правится,
+пока не пройдет window секунд (или сводка не станет слишком длинной), после
+чего начинается новая. Запросов к API и сообщений бота становится столько,
+сколько интервалов, а не сколько сообщений в чате.
+"""
+
+import asyncio
+import logging
+import time
+
+from services import metrics
+from services.deadline import deadline_scope
+from services.langdetect import detect_language
+
+logger = logging.getLogger(__name__)
+
+DIGEST_MESSAGES = metrics.counter(
+    "bot_digest_messages_total", "Сообщения групп в сводках перевода", ["result"]
+)
+
+
+class _Digest:
+    """Текущая сводка чата: ожидающие перевода сообщения и уже показанные строки"""
+
+    __slots__ = (
+        "chat_id", "target_lang", "started", "pending", "lines", "chars", "seen", "message", "timer", "task",
+        "expiry",
+    )
+
+    def __init__(self, chat_id, target_lang):
+        self.chat_id = chat_id
+        self.target_lang = target_lang
+        self.started = time.monotonic()
+        self.pending = []
+        self.lines = []
+        self.chars = 0
+        self.seen = set()
+        self.message = None
+        self.timer = None
+        self.task = None
+        self.expiry = None
+
+
+class DigestBuffer:
+    """
+    translate_texts - корутина (тексты, язык перевода) -> список переводов
+    publish - корутина (chat_id, язык перевода, текст сводки, сообщение или None) -> сообщение;
+    без сообщения сводка отправляется, иначе оно правится
+    window - сколько секунд дописывается одна сводка
+    interval - как часто переводятся накопленные сообщения, секунд
+    max_texts / max_chars - лимиты одного запроса к API
+    max_length - длина сводки, после которой начинается новая
+    deadline - срок перевода и отправки одной порции, секунд
+    """
+
+    def __init__(self, translate_texts, publish, window=60, interval=5,
+                 max_texts=100, max_chars=10000, max_length=3900, deadline=None):
+        self.translate_texts = translate_texts
+        self.publish = publish
+        self.window = window
+        self.interval = interval
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        self.max_length = max_length
+        self.deadline = deadline
+        self._digests = {}
+        self._tasks = set()
+
+    def __len__(self):
+        return len(self._digests)
+
+    def add(self, chat_id, target_lang, author, text):
+        """
+        Сообщение в сводку чата. Текст на языке перевода и повтор
+        уже попавшего в сводку текста пропускаются; возвращает, добавлено ли
+        """
+        text = text.strip()
+        if not text or detect_language(text) == target_lang:
+            DIGEST_MESSAGES.inc(result="same_language")
+            return False
+
+        digest = self._digests.get(chat_id)
+        if digest is None or digest.target_lang != target_lang or self._expired(digest):
+            digest = self._digests[chat_id] = _Digest(chat_id, target_lang)
+
+        if text in digest.seen:
+            DIGEST_MESSAGES.inc(result="duplicate")
+            return False
+        digest.seen.add(text)
+        digest.pending.append((author, text))
+        DIGEST_MESSAGES.inc(result="queued")
+
+        if digest.timer is None and digest.task is None:
+            # Срок обновления, с которого началась порция, к сводке не относится
+            with deadline_scope(None, replace=True):
+                self._schedule(digest)
+        return True
+
+    def _expired(self, digest):
+        """Сводка закрыта: окно прошло, и в работе ничего нет"""
+        return (
+            digest.timer is None and digest.task is None and not digest.pending
+            and time.monotonic() - digest.started >= self.window
+        )
+
+    def _schedule(self, digest):
+        digest.timer = asyncio.get_running_loop().call_later(self.interval, self._start_flush, digest)
+
+    def _start_flush(self, digest):
+        digest.timer = None
+        digest.task = asyncio.create_task(self._flush(digest))
+        self._tasks.add(digest.task)
+        digest.task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, digest):
+        """Перевод накопленных сообщений одним запросом и обновление сводки"""
+        try:
+            while digest.pending:
+                pack, chars = [], 0
+                while digest.pending and len(pack) < self.max_texts:
+                    length = len(digest.pending[0][1])
+                    if pack and chars + length > self.max_chars:
+                        break
+                    pack.append(digest.pending.pop(0))
+                    chars += length
+                await self._publish(digest, pack)
+        finally:
+            digest.task = None
+            if digest.pending:
+                # Сообщения, пришедшие во время перевода, - в следующей порции
+                self._schedule(digest)
+            else:
+                self._schedule_expiry(digest)
+
+    def _schedule_expiry(self, digest):
+        """Удаление сводки из памяти, когда закончится ее окно"""
+        if digest.expiry is not None:
+            digest.expiry.cancel()
+        delay = max(digest.started + self.window - time.monotonic(), 0)
+        digest.expiry = asyncio.get_running_loop().call_later(delay, self._drop, digest)
+
+    def _drop(self, digest):
+        digest.expiry = None
+        # Если в сводку успели написать, удаление назначит следующая порция
+        if self._expired(digest) and self._digests.get(digest.chat_id) is digest:
+            del self._digests[digest.chat_id]
+
+    async def _publish(self, digest, pack):
+        try:
+            with deadline_scope(self.deadline, replace=True):
+                translations = await self.translate_texts([text for _, text in pack], digest.target_lang)
+        except Exception as e:
+            # API перегружено или недоступно: в группе сообщение об ошибке
+            # только мешает - порция пропускается
+            DIGEST_MESSAGES.inc(len(pack), result="failed")
+            logger.warning("Сводка не переведена", extra={
+                "chat_id": digest.chat_id, "messages": len(pack), "error": repr(e),
+            })
+            return
+
+        for (author, _), translated in zip(pack, translations):
+            line = f"{author}: {translated}"
+            if digest.lines and digest.chars + len(line) + 1 > self.max_length:
+                # Сводка заполнена - продолжение в новом сообщении
+                await self._send(digest)
+                digest.message, digest.lines, digest.chars = None, [], 0
+            digest.lines.append(line)
+            digest.chars += len(line) + 1
+        DIGEST_MESSAGES.inc(len(pack), result="translated")
+        await self._send(digest)
+
+    async def _send(self, digest):
+        try:
+            digest.message = await self.publish(
+                digest.chat_id, digest.target_lang, "\n".join(digest.lines), digest.message
+            )
+        except Exception as e:
+            # Сводка не отправлена (бота удалили из чата, нет прав) - следующая будет новым сообщением
+            logger.warning("Сводка не отправлена", extra={"chat_id": digest.chat_id, "error": repr(e)})
+            digest.message = None
+
+    async def close(self):
+        """Остановка: накопленные сообщения переводятся и публикуются сразу"""
+        for digest in list(self._digests.values()):
+            if digest.expiry is not None:
+                digest.expiry.cancel()
+                digest.expiry = None
+            if digest.timer is not None:
+                digest.timer.cancel()
+                self._start_flush(digest)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+__all__ = ['DigestBuffer']
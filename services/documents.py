@@ -0,0 +1,258 @@
+"""
+services/documents.py - Потоковый перевод файлов .txt, .srt и .csv
+
+Файл читается построчно генератором и делится на единицы (строка текста,
+субтитр, строка таблицы): тексты для перевода и способ собрать из перевода
+исходную структуру (номера и время субтитров, столбцы, переводы строк).
+Тексты единиц складываются в пачки до лимитов одного запроса к API,
+несколько пачек переводятся одновременно, а готовые пачки записываются
+по порядку. В памяти одновременно только concurrency пачек, поэтому
+потребление памяти не зависит от размера файла.
+"""
+
+import asyncio
+import csv
+import io
+from collections import deque
+
+from services.chunking import split_text
+
+# Сколько байт начала CSV-файла смотреть для определения разделителя
+CSV_SNIFF_BYTES = 4096
+CSV_DELIMITERS = ",;\t|"
+
+# Сколько единиц (с неизменяемыми) может быть в одной пачке
+MAX_PACK_UNITS = 1000
+
+
+class Unit:
+    """Часть документа: тексты для перевода и сборка результата"""
+
+    __slots__ = ("texts", "render")
+
+    def __init__(self, texts, render):
+        self.texts = texts
+        self.render = render
+
+
+def _split_ending(line):
+    """Строка без перевода строки и сам перевод строки (\\n, \\r\\n или пусто)"""
+    body = line.rstrip("\r\n")
+    return body, line[len(body):]
+
+
+def _has_letters(text):
+    return any(char.isalpha() for char in text)
+
+
+def _literal(text):
+    return Unit([], lambda _: text)
+
+
+def read_txt(stream):
+    """Единицы текстового файла: каждая непустая строка переводится отдельно"""
+    for line in stream:
+        body, ending = _split_ending(line)
+        stripped = body.strip()
+        if not _has_letters(stripped):
+            yield _literal(line)
+            continue
+        # Отступы строки сохраняются
+        start = body.index(stripped)
+        head, tail = body[:start], body[start + len(stripped):] + ending
+        yield Unit([stripped], lambda translated, head=head, tail=tail: head + translated[0] + tail)
+
+
+def read_srt(stream):
+    """
+    Единицы файла субтитров: номер и время остаются, текст субтитра
+    переводится целиком (строки субтитра - одна фраза)
+    """
+    block = []
+    for line in stream:
+        if line.strip():
+            block.append(line)
+            continue
+        if block:
+            yield _srt_cue(block)
+            block = []
+        yield _literal(line)
+    if block:
+        yield _srt_cue(block)
+
+
+def _srt_cue(lines):
+    # Заголовок - строки до времени включительно (номер может отсутствовать)
+    header = 0
+    for index, line in enumerate(lines[:2]):
+        if "-->" in line:
+            header = index + 1
+            break
+    head, text_lines = "".join(lines[:header]), lines[header:]
+
+    bodies = [_split_ending(line) for line in text_lines]
+    text = "\n".join(body for body, _ in bodies)
+    if not _has_letters(text):
+        return _literal("".join(lines))
+
+    # Переносы внутри субтитра - как в исходном файле
+    line_ending = bodies[0][1] or "\n"
+    last_ending = bodies[-1][1]
+
+    def render(translated):
+        return head + translated[0].replace("\n", line_ending) + last_ending
+
+    return Unit([text], render)
+
+
+def read_csv(stream):
+    """
+    Единицы CSV-файла: строки таблицы, переводятся ячейки с буквами,
+    числа, даты и пустые ячейки остаются как есть
+    """
+    sample = stream.read(CSV_SNIFF_BYTES)
+    # Sniffer надежно определяет только разделитель, кавычки - как в Excel
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ","
+
+    def lines():
+        yield from io.StringIO(sample)
+        yield from stream
+
+    # Построчная запись в общий буфер: единицы собираются строго по порядку;
+    # строки заканчиваются так же, как в исходном файле
+    first_line = sample.partition("\n")[0]
+    lineterminator = "\r\n" if first_line.endswith("\r") else "\n"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator=lineterminator)
+
+    def write_row(row):
+        writer.writerow(row)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    for row in csv.reader(_rejoin(lines()), delimiter=delimiter):
+        columns = [index for index, cell in enumerate(row) if _has_letters(cell)]
+        if not columns:
+            yield Unit([], lambda _, row=row: write_row(row))
+            continue
+
+        def render(translated, row=row, columns=columns):
+            row = list(row)
+            for index, value in zip(columns, translated):
+                row[index] = value
+            return write_row(row)
+
+        yield Unit([row[index] for index in columns], render)
+
+
+def _rejoin(lines):
+    """
+    Склейка строк, разрезанных на границе образца для Sniffer
+    (образец может закончиться посреди строки файла)
+    """
+    pending = ""
+    for line in lines:
+        pending += line
+        if pending.endswith("\n"):
+            yield pending
+            pending = ""
+    if pending:
+        yield pending
+
+
+READERS = {
+    ".txt": read_txt,
+    ".srt": read_srt,
+    ".csv": read_csv,
+}
+
+
+class _Pack:
+    """Единицы документа, тексты которых уходят одним запросом"""
+
+    __slots__ = ("units", "texts", "chars", "task")
+
+    def __init__(self):
+        self.units = []
+        self.texts = []
+        self.chars = 0
+        self.task = None
+
+
+async def translate_units(units, translate_texts, write, max_texts=100, max_chars=10000, concurrency=4, on_pack=None):
+    """
+    Перевод потока единиц с записью результата по порядку.
+
+    translate_texts - корутина (список текстов) -> список переводов
+    write - запись готового фрагмента документа
+    max_texts / max_chars - лимиты одного запроса к API
+    concurrency - сколько запросов выполняется одновременно
+    on_pack - корутина (число переведенных символов) после записи каждой пачки
+
+    Возвращает число символов, отправленных на перевод
+    """
+    in_flight = deque()
+    pack = _Pack()
+    total = 0
+
+    async def write_oldest():
+        done = in_flight.popleft()
+        translations = iter(await done.task)
+        for unit, parts in done.units:
+            translated = []
+            for pieces in parts:
+                # Длинный текст переведен частями - склейка с исходными разделителями
+                translated.append("".join(next(translations) + separator for _, separator in pieces))
+            write(unit.render(translated))
+        if on_pack is not None:
+            await on_pack(done.chars)
+
+    async def send():
+        nonlocal pack
+        if pack.texts:
+            pack.task = asyncio.ensure_future(translate_texts(pack.texts))
+        else:
+            # Только неизменяемые части - готовый результат без запроса
+            pack.task = asyncio.get_running_loop().create_future()
+            pack.task.set_result([])
+        in_flight.append(pack)
+        pack = _Pack()
+        if len(in_flight) >= concurrency:
+            await write_oldest()
+
+    try:
+        for unit in units:
+            parts = [
+                split_text(text, max_chars) if len(text) > max_chars else [(text, "")]
+                for text in unit.texts
+            ]
+            texts = [piece for pieces in parts for piece, _ in pieces]
+            chars = sum(len(text) for text in texts)
+
+            if pack.texts and (len(pack.texts) + len(texts) > max_texts or pack.chars + chars > max_chars):
+                await send()
+            pack.units.append((unit, parts))
+            pack.texts.extend(texts)
+            pack.chars += chars
+            total += chars
+
+            # Много неизменяемых частей подряд тоже не копятся в памяти
+            if len(pack.units) >= MAX_PACK_UNITS:
+                await send()
+
+        if pack.units:
+            await send()
+        while in_flight:
+            await write_oldest()
+    finally:
+        for pending in in_flight:
+            pending.task.cancel()
+    return total
+
+
+__all__ = ['Unit', 'READERS', 'read_txt', 'read_srt', 'read_csv', 'translate_units']
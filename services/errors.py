@@ -0,0 +1,38 @@
+"""
+services/errors.py - Ошибки при работе с API перевода
+"""
+
+
+class TranslateApiError(Exception):
+    """API вернуло ответ с ошибкой"""
+
+    def __init__(self, status_code, message="", retry_after=None):
+        super().__init__(f"Ошибка API: {status_code} {message}".strip())
+        self.status_code = status_code
+        self.message = message
+        # Сколько секунд просит подождать API (заголовок Retry-After)
+        self.retry_after = retry_after
+
+
+class TranslatorUnavailable(Exception):
+    """Перевод сейчас невозможен, пользователю нужно попробовать позже"""
+
+
+class OverloadedError(TranslatorUnavailable):
+    """Очередь запросов к API переполнена"""
+
+
+class BudgetExhaustedError(TranslatorUnavailable):
+    """Исчерпан дневной бюджет символов"""
+
+
+class CircuitOpenError(TranslatorUnavailable):
+    """API недавно много раз отказывало, запросы временно не отправляются"""
+
+
+class DeadlineExceededError(TranslatorUnavailable):
+    """Перевод не успевает к сроку обработки обновления"""
+
+
+class QuotaExceededError(Exception):
+    """Пользователь исчерпал дневной лимит переводов"""
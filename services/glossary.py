@@ -0,0 +1,89 @@
+"""
+services/glossary.py - Глоссарии: обязательные переводы терминов
+
+Общий глоссарий загружается из JSON-файла (GLOSSARY_PATH), личные термины
+пользователя хранятся в его данных бота. Формат в обоих случаях:
+{"en-ru": {"термин": "перевод", ...}, ...}
+"""
+
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ограничение API: не больше 50 пар в одном запросе
+MAX_GLOSSARY_PAIRS = 50
+
+
+def pair_key(source_lang, target_lang):
+    return f"{source_lang}-{target_lang}"
+
+
+class Glossary:
+    """Набор пар (термин, перевод) для одного запроса к API"""
+
+    __slots__ = ("pairs", "key")
+
+    def __init__(self, pairs):
+        self.pairs = tuple(sorted(pairs))
+        digest = hashlib.blake2b(repr(self.pairs).encode(), digest_size=6)
+        self.key = digest.hexdigest()
+
+    def __eq__(self, other):
+        return isinstance(other, Glossary) and self.pairs == other.pairs
+
+    def __hash__(self):
+        return hash(self.pairs)
+
+    def to_api(self):
+        """Поле glossaryConfig запроса к API"""
+        return {
+            "glossaryData": {
+                "glossaryPairs": [
+                    {"sourceText": source, "translatedText": translated}
+                    for source, translated in self.pairs
+                ]
+            }
+        }
+
+
+class GlossaryStore:
+    """Общий глоссарий и выбор терминов для конкретного текста"""
+
+    def __init__(self, path=""):
+        self.terms = self._load(path) if path else {}
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось загрузить глоссарий", extra={"path": path, "error": repr(e)})
+            return {}
+        return {pair: dict(terms) for pair, terms in data.items()}
+
+    def select(self, text, source_lang, target_lang, user_terms=None):
+        """
+        Глоссарий из терминов, встречающихся в тексте (личные термины
+        важнее общих), или None. Без известного исходного языка API
+        глоссарий не принимает
+        """
+        if not source_lang:
+            return None
+        key = pair_key(source_lang, target_lang)
+        terms = dict(self.terms.get(key, ()))
+        if user_terms:
+            terms.update(user_terms.get(key, ()))
+        if not terms:
+            return None
+
+        lowered = text.casefold()
+        pairs = [(source, translated) for source, translated in terms.items() if source.casefold() in lowered]
+        if not pairs:
+            return None
+        return Glossary(pairs[:MAX_GLOSSARY_PAIRS])
+
+
+__all__ = ['Glossary', 'GlossaryStore', 'MAX_GLOSSARY_PAIRS', 'pair_key']
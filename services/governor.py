@@ -0,0 +1,154 @@
+"""
+services/governor.py - Общий бюджет запросов к API: скорость, символы и приоритеты
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from services.errors import BudgetExhaustedError, OverloadedError
+from services.quota import DailyCounter
+
+# Приоритеты: чем меньше число, тем раньше запрос уходит в API
+PRIORITY_INTERACTIVE = 0
+PRIORITY_QUICK = 1
+PRIORITY_BULK = 2
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Сколько секунд ждать, пока хватит токенов"""
+        self._refill()
+        # Запрос больше емкости ждет полного ведра и уводит его в минус
+        need = min(amount, self.capacity)
+        if self.tokens >= need:
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def pause(self, seconds):
+        """Следующий токен - не раньше чем через seconds секунд"""
+        self._refill()
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+
+class ApiGovernor:
+    """
+    Ограничитель перед API: запросы в секунду, символы в секунду
+    и дневной бюджет символов. Ожидающие запросы стоят в ограниченной
+    очереди с приоритетами; при переполнении новые сразу отклоняются.
+
+    Скорость ограничивается в каждом процессе отдельно, а дневной бюджет
+    общий, если day_chars - общий счетчик (SqliteDailyCounter)
+    """
+
+    def __init__(self, requests_per_second=20, chars_per_second=250, daily_chars=0, max_queue=200, day_chars=None):
+        self.requests = TokenBucket(requests_per_second)
+        self.chars = TokenBucket(chars_per_second, capacity=max(chars_per_second, 10000))
+        self.daily_chars = daily_chars
+        self.max_queue = max_queue
+
+        self.day_chars = day_chars or DailyCounter()
+        self._queue = []
+        self._seq = itertools.count()
+        self._dispatcher = None
+
+    def is_overloaded(self):
+        """Новый запрос будет отклонен"""
+        return len(self._queue) >= self.max_queue or self._budget_left() == 0
+
+    def is_idle(self):
+        """В очереди никто не ждет"""
+        return not self._queue
+
+    def _budget_left(self):
+        """Остаток дневного бюджета символов (None - без ограничения)"""
+        if not self.daily_chars:
+            return None
+        self.day_chars.refresh_later()
+        return max(self.daily_chars - self.day_chars.get(), 0)
+
+    def _check_budget(self, chars):
+        left = self._budget_left()
+        if left is not None and chars > left:
+            raise BudgetExhaustedError(
+                f"Дневной бюджет символов исчерпан ({self.day_chars.get()} из {self.daily_chars})"
+            )
+
+    def _wait_time(self, chars):
+        return max(self.requests.wait_time(1), self.chars.wait_time(chars))
+
+    def _take(self, chars):
+        self.requests.consume(1)
+        self.chars.consume(chars)
+        self.day_chars.add(chars)
+
+    async def acquire(self, chars, priority=PRIORITY_BULK):
+        """Ожидание разрешения отправить запрос с chars символами"""
+        self._check_budget(chars)
+
+        # Быстрый путь: очереди нет и лимиты позволяют
+        if not self._queue and self._wait_time(chars) == 0:
+            self._take(chars)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            raise OverloadedError("Очередь запросов к API переполнена")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), chars, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        await future
+
+    async def _dispatch(self):
+        """Выдача разрешений по приоритету, как только позволяют лимиты"""
+        while self._queue:
+            _, _, chars, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            wait = self._wait_time(chars)
+            if wait > 0:
+                # После ожидания в голове очереди может оказаться более важный запрос
+                await asyncio.sleep(wait)
+                continue
+
+            heapq.heappop(self._queue)
+            try:
+                self._check_budget(chars)
+            except BudgetExhaustedError as e:
+                future.set_exception(e)
+                continue
+            self._take(chars)
+            future.set_result(None)
+
+    def usage(self):
+        """Текущее использование бюджета"""
+        return {
+            "day_chars": self.day_chars.get(),
+            "daily_chars": self.daily_chars,
+            "queue": len(self._queue),
+            "max_queue": self.max_queue,
+            "requests_available": round(max(self.requests.tokens, 0), 1),
+            "chars_available": round(max(self.chars.tokens, 0)),
+        }
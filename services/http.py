@@ -0,0 +1,17 @@
+"""
+services/http.py - Общий SSL-контекст для HTTP-клиентов
+"""
+
+import ssl
+from functools import lru_cache
+
+import certifi
+
+
+@lru_cache(maxsize=None)
+def ssl_context():
+    """
+    Загрузка корневых сертификатов занимает около 100 мс,
+    поэтому клиенты Telegram и Yandex используют один контекст
+    """
+    return ssl.create_default_context(cafile=certifi.where())
@@ -0,0 +1,102 @@
+"""
+services/inflight.py - Выполняющаяся работа пользователей: отмена и остановка
+
+Обработчики регистрируют свою задачу по ключу (пользователю). /cancel отменяет
+задачи пользователя, а при остановке бота работа дообрабатывается не дольше
+заданного времени, после чего оставшиеся задачи отменяются. Отмена доходит до
+запроса к API (SingleFlight, TranslationBatcher), а списанный лимит возвращается.
+"""
+
+import asyncio
+import logging
+import weakref
+from contextlib import contextmanager
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+CANCELLED = metrics.counter("bot_cancelled_tasks_total", "Работа, отмененная пользователем или при остановке", ["reason"])
+
+
+class TaskRegistry:
+    """Задачи по ключам с отменой по ключу и ограниченной по времени остановкой"""
+
+    def __init__(self):
+        self._tasks = {}
+        self._cancelled = weakref.WeakSet()
+        self._closing = False
+
+    def __len__(self):
+        return sum(len(tasks) for tasks in self._tasks.values())
+
+    @contextmanager
+    def track(self, key):
+        """Текущая задача выполняется для key и может быть отменена через cancel(key)"""
+        task = asyncio.current_task()
+        if self._closing:
+            # Бот останавливается - новая работа не начинается
+            self._cancel(task, "shutdown")
+        tasks = self._tasks.setdefault(key, set())
+        tasks.add(task)
+        try:
+            yield
+        finally:
+            tasks.discard(task)
+            if not tasks and self._tasks.get(key) is tasks:
+                del self._tasks[key]
+
+    def busy(self, key):
+        """У key есть выполняющаяся работа"""
+        return bool(self._tasks.get(key))
+
+    def _cancel(self, task, reason):
+        if task.done() or task in self._cancelled:
+            return False
+        self._cancelled.add(task)
+        task.cancel()
+        CANCELLED.inc(reason=reason)
+        return True
+
+    def cancel(self, key):
+        """Отмена работы ключа; возвращает число отмененных задач"""
+        return sum(self._cancel(task, "user") for task in list(self._tasks.get(key, ())))
+
+    def interrupted(self):
+        """
+        Текущая задача отменена через реестр (а не извне). Вызывается
+        в обработчике CancelledError: True - отмену можно не передавать дальше
+        """
+        task = asyncio.current_task()
+        if task not in self._cancelled:
+            return False
+        self._cancelled.discard(task)
+        task.uncancel()
+        return True
+
+    async def drain(self, timeout):
+        """
+        Остановка: ожидание работы не дольше timeout секунд, затем отмена
+        оставшейся. Работа, начатая после вызова, отменяется сразу
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._tasks:
+            left = deadline - loop.time()
+            if left <= 0:
+                break
+            await asyncio.wait([task for tasks in self._tasks.values() for task in tasks], timeout=left)
+
+        self._closing = True
+        pending = [task for tasks in self._tasks.values() for task in tasks]
+        if pending:
+            logger.warning("Остановка: отмена незавершенной работы", extra={"tasks": len(pending)})
+            for task in pending:
+                self._cancel(task, "shutdown")
+
+
+# Общий реестр процесса
+inflight = TaskRegistry()
+
+
+__all__ = ['TaskRegistry', 'inflight']
@@ -0,0 +1,260 @@
+"""
+services/langdetect.py - Локальное определение языка текста без запросов к API
+
+Сначала по диапазонам символов определяется письменность: хангыль - корейский,
+кана - японский, иероглифы без каны - китайский. На кириллице и латинице пишут
+на многих языках, поэтому язык возвращается только при надежных признаках:
+кириллица - русский или украинский по буквам и словам, которые есть только
+в нем; латиница (en, es, fr, de, it) - по профилям триграмм, если в тексте нет
+букв других алфавитов, большая часть триграмм знакома профилю-победителю
+и его отрыв от второго велик. Иначе возвращается None,
+и язык определяет API: ошибка здесь означает неверный sourceLanguageCode
+или пропуск перевода текста, "уже написанного на языке перевода".
+"""
+
+import math
+import re
+
+# Сколько первых символов текста учитывается (достаточно для уверенного ответа)
+SAMPLE_CHARS = 300
+
+# Минимум букв для определения языка по триграммам
+MIN_LETTERS = 8
+
+# Минимальный отрыв лучшего языка от второго (средний log-вес на триграмму)
+MIN_MARGIN = 0.35
+
+# Минимальная доля триграмм текста, встречающихся в профиле лучшего языка
+# (названия товаров, имена, другие языки на той же письменности - ниже)
+MIN_COVERAGE = 0.6
+
+# Буквы латиницы и кириллицы, которые бывают в языках профилей;
+# другие (ã, ł, ş, ø, ў, қ, ј...) - признак языка без профиля
+_LATIN_LETTERS = set("abcdefghijklmnopqrstuvwxyzáéíóúñüàèìòùâêîôûçëïœæäößÿ")
+_CYRILLIC_LETTERS = set("абвгдеёжзийклмнопрстуфхцчшщъыьэюяіїєґ")
+
+# Тексты, по которым строятся профили латинских языков
+_PROFILE_TEXTS = {
+    "en": (
+        "the quick brown fox jumps over the lazy dog. what is this and where are you going? "
+        "i think that we should meet tomorrow with them because they have been there. "
+        "thank you very much for your help, it was really nice to see you again. "
+        "please let me know when you are ready and which one would you like. "
+        "this is the best thing that ever happened to me in the world. "
+        "how are you doing today? i would like to order something to eat and drink. "
+        "there are many people who want to learn something new every day. "
+        "could you tell me the way to the station, i have lost my phone and my keys. "
+        "the of and to in is you that it he was for on are as with his they at be this have "
+        "from or one had by word but not what all were we when your can said there use an each "
+        "which she do how their if will up other about out many then them these so some her "
+        "would make like him into time has look two more write go see number no way could "
+        "people my than first water been call who oil its now find long down day did get come "
+        "made may part city library where"
+    ),
+    "es": (
+        "el rápido zorro marrón salta sobre el perro perezoso. ¿qué es esto y adónde vas? "
+        "creo que deberíamos reunirnos mañana con ellos porque han estado allí. "
+        "muchas gracias por tu ayuda, fue muy bueno verte otra vez. "
+        "por favor avísame cuando estés listo y cuál te gustaría. "
+        "esto es lo mejor que me ha pasado en la vida y en el mundo. "
+        "¿cómo estás hoy? quisiera pedir algo de comer y de beber. "
+        "hay muchas personas que quieren aprender algo nuevo cada día. "
+        "¿podrías decirme el camino a la estación? he perdido mi teléfono y mis llaves. "
+        "de la que el en y a los se del las un por con no una su para es al lo como más pero "
+        "sus le ya o este sí porque esta entre cuando muy sin sobre también me hasta hay donde "
+        "dónde quien desde todo nos durante todos uno les ni contra otros ese eso ante ellos e "
+        "esto mí antes algunos qué unos yo otro otras otra él tanto esa estos mucho quienes "
+        "nada muchos cual poco ella estar estas algunas algo nosotros ciudad biblioteca hoy "
+        "trabajo"
+    ),
+    "fr": (
+        "le rapide renard brun saute par-dessus le chien paresseux. qu'est-ce que c'est et où vas-tu ? "
+        "je pense que nous devrions nous retrouver demain avec eux parce qu'ils étaient là. "
+        "merci beaucoup pour ton aide, c'était vraiment agréable de te revoir. "
+        "s'il te plaît, dis-moi quand tu es prêt et lequel tu voudrais. "
+        "c'est la meilleure chose qui me soit arrivée dans la vie et dans le monde. "
+        "comment vas-tu aujourd'hui ? je voudrais commander quelque chose à manger et à boire. "
+        "il y a beaucoup de gens qui veulent apprendre quelque chose de nouveau chaque jour. "
+        "pourriez-vous m'indiquer le chemin de la gare ? j'ai perdu mon téléphone et mes clés. "
+        "de la le et les des en un du une que est pour qui dans a par plus pas au sur ne se ce "
+        "il sont ou avec son mais comme on tout nous sa aux cette elle ses ils leur bien aussi "
+        "être été fait peut entre où sans sous depuis très ville bibliothèque aujourd'hui "
+        "travail toujours encore"
+    ),
+    "de": (
+        "der schnelle braune fuchs springt über den faulen hund. was ist das und wohin gehst du? "
+        "ich denke, dass wir uns morgen mit ihnen treffen sollten, weil sie dort gewesen sind. "
+        "vielen dank für deine hilfe, es war wirklich schön, dich wiederzusehen. "
+        "bitte sag mir, wann du bereit bist und welches du möchtest. "
+        "das ist das beste, was mir jemals im leben und auf der welt passiert ist. "
+        "wie geht es dir heute? ich möchte etwas zu essen und zu trinken bestellen. "
+        "es gibt viele menschen, die jeden tag etwas neues lernen wollen. "
+        "könnten sie mir den weg zum bahnhof zeigen? ich habe mein handy und meine schlüssel verloren. "
+        "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch "
+        "es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über "
+        "einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei stadt "
+        "bibliothek heute arbeit immer wo"
+    ),
+    "it": (
+        "la veloce volpe marrone salta sopra il cane pigro. che cos'è questo e dove stai andando? "
+        "penso che dovremmo incontrarci domani con loro perché sono stati lì. "
+        "grazie mille per il tuo aiuto, è stato davvero bello rivederti. "
+        "per favore fammi sapere quando sei pronto e quale vorresti. "
+        "questa è la cosa più bella che mi sia mai successa nella vita e nel mondo. "
+        "come stai oggi? vorrei ordinare qualcosa da mangiare e da bere. "
+        "ci sono molte persone che vogliono imparare qualcosa di nuovo ogni giorno. "
+        "potresti indicarmi la strada per la stazione? ho perso il mio telefono e le mie chiavi. "
+        "di e il la che in a per un è non una i del le si da con al sono della anche più ma "
+        "come lo dei nel gli questo alla ha se o ci mi delle cosa tutto quando perché ancora "
+        "dove chi oggi città biblioteca lavoro sempre molto bene grazie"
+    ),
+}
+
+# Кириллица: буквы, которые из языков ru, uk, bg есть только в одном,
+# и частые слова, которые есть только в русском (среди ru, uk, bg, sr, mk).
+# Текст без таких признаков (или с признаками двух языков) язык не получает
+_RU_LETTERS = set("ыэё")
+_UK_LETTERS = set("іїєґ")
+_RU_WORDS = frozenset((
+    "что когда очень сегодня хорошо меня тебя спасибо нужно будет его только уже можно сейчас "
+    "если нет ничего почему пожалуйста сказать здравствуйте привет вообще конечно может"
+).split())
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def _trigrams(text):
+    """Триграммы слов с границами: "the" -> " th", "the", "he \""""
+    for word in _WORD_RE.findall(text):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _build_profiles(texts):
+    """
+    Таблица триграмма -> log-вероятности по языкам (с add-one сглаживанием)
+    и строка весов для неизвестных триграмм
+    """
+    langs = tuple(texts)
+    counts = {}
+    totals = []
+    for index, lang in enumerate(langs):
+        total = 0
+        for gram in _trigrams(texts[lang]):
+            counts.setdefault(gram, [0] * len(langs))[index] += 1
+            total += 1
+        totals.append(total)
+
+    vocabulary = len(counts) + 1
+    denominators = [math.log(total + vocabulary) for total in totals]
+    table = {
+        gram: tuple(math.log(row[i] + 1) - denominators[i] for i in range(len(langs)))
+        for gram, row in counts.items()
+    }
+    unknown = tuple(-d for d in denominators)
+    return langs, table, unknown
+
+
+_LATIN_PROFILES = _build_profiles(_PROFILE_TEXTS)
+
+
+def _script_counts(sample):
+    """Количество букв каждой письменности"""
+    latin = cyrillic = hangul = kana = han = 0
+    for ch in sample:
+        code = ord(ch)
+        if code < 0x80:
+            if ch.isalpha():
+                latin += 1
+        elif 0x400 <= code <= 0x4FF:
+            cyrillic += 1
+        elif 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            hangul += 1
+        elif 0x3040 <= code <= 0x30FF:
+            kana += 1
+        elif 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+            han += 1
+        elif code <= 0x24F and ch.isalpha():
+            latin += 1
+    return latin, cyrillic, hangul, kana, han
+
+
+def _foreign_letters(sample, alphabet):
+    """В тексте есть буквы (не ASCII), которых нет в alphabet"""
+    return any(ch.isalpha() and ch not in alphabet for ch in sample if ch > "\x7f")
+
+
+def _detect_cyrillic(sample):
+    """Русский или украинский по признакам, которые есть только в нем (или None)"""
+    if _foreign_letters(sample, _CYRILLIC_LETTERS):
+        return None
+    letters = set(sample)
+    ru = bool(letters & _RU_LETTERS) or any(word in _RU_WORDS for word in _WORD_RE.findall(sample))
+    uk = bool(letters & _UK_LETTERS)
+    if ru and not uk:
+        return "ru"
+    if uk and not ru and "ъ" not in letters:
+        return "uk"
+    return None
+
+
+def _detect_by_profiles(sample, profiles, alphabet):
+    """
+    Язык профиля с наибольшим весом триграмм или None: буквы чужого алфавита,
+    мало знакомых профилю триграмм или малый отрыв от второго языка
+    """
+    if _foreign_letters(sample, alphabet):
+        return None
+
+    langs, table, unknown = profiles
+    scores = [0.0] * len(langs)
+    known = [0] * len(langs)
+    grams = 0
+    for gram in _trigrams(sample):
+        row = table.get(gram, unknown)
+        for i, weight in enumerate(row):
+            scores[i] += weight
+            if weight != unknown[i]:
+                known[i] += 1
+        grams += 1
+    if not grams:
+        return None
+
+    ranked = sorted(range(len(langs)), key=scores.__getitem__, reverse=True)
+    best = ranked[0]
+    margin = (scores[best] - scores[ranked[1]]) / grams
+    if margin < MIN_MARGIN or known[best] < grams * MIN_COVERAGE:
+        return None
+    return langs[best]
+
+
+def detect_language(text):
+    """
+    Код языка текста или None, если язык не удалось определить уверенно
+    (тогда его определяет API)
+    """
+    if not text:
+        return None
+    sample = text[:SAMPLE_CHARS].lower()
+    latin, cyrillic, hangul, kana, han = _script_counts(sample)
+
+    letters = latin + cyrillic + hangul + kana + han
+    if not letters:
+        return None
+
+    # Письменность, на которой написано больше половины букв
+    if hangul * 2 > letters:
+        return "ko"
+    if kana and (kana + han) * 2 > letters:
+        return "ja"
+    if han * 2 > letters:
+        return "zh"
+    if cyrillic * 2 > letters:
+        return _detect_cyrillic(sample)
+    if latin * 2 > letters and latin >= MIN_LETTERS:
+        return _detect_by_profiles(sample, _LATIN_PROFILES, _LATIN_LETTERS)
+    return None
+
+
+__all__ = ['detect_language']
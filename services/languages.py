@@ -0,0 +1,168 @@
+"""
+services/languages.py - Каталог языков перевода
+
+Список языков загружается из API (listLanguages) и обновляется в фоне, когда
+устаревает; до первой загрузки и при ошибках используется встроенный список.
+Клавиатуры выбора языка и текст /languages строятся один раз для каждой
+версии каталога и переиспользуются.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from services.chunking import split_message
+
+logger = logging.getLogger(__name__)
+
+# Встроенный список: названия на русском для языков API перевода
+FALLBACK_LANGUAGES = {
+    "ru": "Русский", "en": "Английский", "es": "Испанский", "fr": "Французский",
+    "de": "Немецкий", "it": "Итальянский", "zh": "Китайский", "ja": "Японский",
+    "ko": "Корейский", "af": "Африкаанс", "am": "Амхарский", "ar": "Арабский",
+    "az": "Азербайджанский", "ba": "Башкирский", "be": "Белорусский", "bg": "Болгарский",
+    "bn": "Бенгальский", "bs": "Боснийский", "ca": "Каталанский", "cs": "Чешский",
+    "cv": "Чувашский", "cy": "Валлийский", "da": "Датский", "el": "Греческий",
+    "eo": "Эсперанто", "et": "Эстонский", "eu": "Баскский", "fa": "Персидский",
+    "fi": "Финский", "ga": "Ирландский", "gd": "Шотландский (гэльский)", "gl": "Галисийский",
+    "gu": "Гуджарати", "he": "Иврит", "hi": "Хинди", "hr": "Хорватский",
+    "ht": "Гаитянский", "hu": "Венгерский", "hy": "Армянский", "id": "Индонезийский",
+    "is": "Исландский", "jv": "Яванский", "ka": "Грузинский", "kk": "Казахский",
+    "km": "Кхмерский", "kn": "Каннада", "ky": "Киргизский", "la": "Латынь",
+    "lb": "Люксембургский", "lo": "Лаосский", "lt": "Литовский", "lv": "Латышский",
+    "mg": "Малагасийский", "mhr": "Марийский", "mi": "Маори", "mk": "Македонский",
+    "ml": "Малаялам", "mn": "Монгольский", "mr": "Маратхи", "ms": "Малайский",
+    "mt": "Мальтийский", "my": "Бирманский", "ne": "Непальский", "nl": "Нидерландский",
+    "no": "Норвежский", "pa": "Панджаби", "pl": "Польский", "pt": "Португальский",
+    "pt-BR": "Португальский (Бразилия)", "ro": "Румынский", "sah": "Якутский", "si": "Сингальский",
+    "sk": "Словацкий", "sl": "Словенский", "sq": "Албанский", "sr": "Сербский",
+    "su": "Сунданский", "sv": "Шведский", "sw": "Суахили", "ta": "Тамильский",
+    "te": "Телугу", "tg": "Таджикский", "th": "Тайский", "tl": "Тагальский",
+    "tr": "Турецкий", "tt": "Татарский", "udm": "Удмуртский", "uk": "Украинский",
+    "ur": "Урду", "uz": "Узбекский", "vi": "Вьетнамский", "xh": "Коса",
+    "yi": "Идиш", "zu": "Зулу",
+}
+
+# Языки в начале клавиатуры, остальные - по алфавиту
+POPULAR_LANGUAGES = ["ru", "en", "es", "fr", "de", "it", "zh", "ja", "ko"]
+
+# Раскладка клавиатуры выбора языка
+BUTTONS_PER_ROW = 3
+ROWS_PER_PAGE = 6
+
+# Сколько недавних языков пользователя показывать первой строкой
+RECENT_LANGUAGES = 3
+
+# Сколько готовых клавиатур с разными недавними языками хранить
+KEYBOARD_CACHE_SIZE = 512
+
+
+class LanguageCatalog:
+    """
+    Список языков с фоновым обновлением и готовыми клавиатурами.
+
+    fetch - корутина без аргументов -> {код: название} из API
+    refresh_interval - через сколько секунд список считается устаревшим
+    retry_interval - пауза перед повторной загрузкой после ошибки
+    """
+
+    def __init__(self, fetch=None, refresh_interval=86400, retry_interval=300):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.version = 0
+        self._next_refresh = 0.0
+        self._refresh_task = None
+        self._set(dict(FALLBACK_LANGUAGES))
+
+    def _set(self, names):
+        """Новая версия каталога и готовые к ней данные"""
+        self.names = names
+        self.version += 1
+
+        order = [code for code in POPULAR_LANGUAGES if code in names]
+        order += sorted((code for code in names if code not in POPULAR_LANGUAGES), key=names.get)
+        self.order = order
+
+        per_page = BUTTONS_PER_ROW * ROWS_PER_PAGE
+        self.pages = [order[i:i + per_page] for i in range(0, len(order), per_page)]
+        self._page_rows = [
+            [
+                [InlineKeyboardButton(names[code], callback_data=f"lang_{code}") for code in page[i:i + BUTTONS_PER_ROW]]
+                for i in range(0, len(page), BUTTONS_PER_ROW)
+            ]
+            for page in self.pages
+        ]
+        self._keyboards = OrderedDict()
+
+        text = "Поддерживаемые языки:\n\n" + "\n".join(f"{names[code]} ({code})" for code in order)
+        self.list_messages = split_message(text)
+
+    def __contains__(self, code):
+        return code in self.names
+
+    def name(self, code):
+        return self.names.get(code, code)
+
+    def keyboard(self, page=0, recent=()):
+        """Клавиатура страницы со строкой недавних языков (готовая для версии каталога)"""
+        page = min(max(page, 0), len(self.pages) - 1)
+        recent = tuple(code for code in recent if code in self.names)[:RECENT_LANGUAGES]
+        key = (page, recent)
+
+        markup = self._keyboards.get(key)
+        if markup is not None:
+            self._keyboards.move_to_end(key)
+            return markup
+
+        rows = []
+        if recent:
+            rows.append([InlineKeyboardButton(f"★ {self.names[code]}", callback_data=f"lang_{code}") for code in recent])
+        rows.extend(self._page_rows[page])
+
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton("◀", callback_data=f"langpage_{page - 1}"))
+        if len(self.pages) > 1:
+            navigation.append(InlineKeyboardButton(f"{page + 1}/{len(self.pages)}", callback_data=f"langpage_{page}"))
+        if page < len(self.pages) - 1:
+            navigation.append(InlineKeyboardButton("▶", callback_data=f"langpage_{page + 1}"))
+        if navigation:
+            rows.append(navigation)
+        rows.append([InlineKeyboardButton("Отмена", callback_data="cancel")])
+
+        markup = self._keyboards[key] = InlineKeyboardMarkup(rows)
+        if len(self._keyboards) > KEYBOARD_CACHE_SIZE:
+            self._keyboards.popitem(last=False)
+        return markup
+
+    def maybe_refresh(self):
+        """Запуск фонового обновления, если список устарел (не ждет его окончания)"""
+        if self.fetch is None or time.monotonic() < self._next_refresh:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+
+    async def refresh(self):
+        """Загрузка списка из API; при ошибке остается текущий"""
+        try:
+            fetched = await self.fetch()
+        except Exception as e:
+            self._next_refresh = time.monotonic() + self.retry_interval
+            logger.warning("Не удалось загрузить список языков", extra={"error": repr(e)})
+            return False
+
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        # Русские названия из встроенного списка, для новых языков - название из API
+        names = {code: FALLBACK_LANGUAGES.get(code) or name or code for code, name in fetched.items()}
+        if names and names != self.names:
+            self._set(names)
+            logger.info("Список языков обновлен", extra={"languages": len(names), "version": self.version})
+        return True
+
+
+__all__ = ['LanguageCatalog', 'FALLBACK_LANGUAGES']
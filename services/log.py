@@ -0,0 +1,95 @@
+"""
+services/log.py - Неблокирующее структурированное логирование
+
+Обработчики только кладут запись в очередь, а форматирование и вывод
+в stdout делает отдельный поток. Записи уровня INFO и ниже можно
+прореживать, а тексты пользователей в лог попадают только как
+длина и хэш (и, по желанию, короткое начало)
+"""
+
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+# Стандартные поля LogRecord, которые не выводятся как дополнительные
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+_listener = None
+_text_preview = 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей уровня INFO и ниже; предупреждения и ошибки - всегда"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+def text_fields(text):
+    """Описание текста пользователя для лога без самого текста"""
+    fields = {
+        "text_len": len(text),
+        "text_hash": hashlib.blake2b(text.encode(), digest_size=6).hexdigest(),
+    }
+    if _text_preview:
+        fields["text_preview"] = text[:_text_preview]
+    return fields
+
+
+def setup_logging(level="INFO", sample_rate=1.0, text_preview=0, stream=None):
+    """Настройка корневого логгера: очередь + фоновый поток вывода"""
+    global _listener, _text_preview
+    _text_preview = text_preview
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Прореживание до постановки в очередь - отброшенные записи ничего не стоят
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+
+def stop_logging():
+    """Вывод оставшихся записей и остановка потока"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
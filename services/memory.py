@@ -0,0 +1,207 @@
+"""
+services/memory.py - Память переводов с нечетким поиском похожих текстов
+
+Хранит пары (исходный текст, язык перевода) -> перевод. Тексты сравниваются
+в виде шаблона: регистр и пробелы не учитываются, пунктуация сохраняется
+("?" и "." меняют смысл), числа заменяются меткой и при повторном
+использовании подставляются в перевод заново. Похожие (но не одинаковые)
+шаблоны по желанию ищутся по MinHash-подписям символьных триграмм
+с разбиением на полосы (LSH); сходство триграмм не видит изменений смысла
+("do" / "do not"), поэтому по умолчанию выключено.
+"""
+
+import random
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Числа вида 12, 3.5, 1,000
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Метка числа в шаблоне текста и метка i-го числа в шаблоне перевода
+_NUMBER_MARK = "\x01"
+_SLOT = "\x00{}\x00"
+_SLOT_RE = re.compile("\x00(\\d+)\x00")
+
+# Простое число Мерсенна для хэш-функций MinHash
+_PRIME = (1 << 61) - 1
+
+# Короче этого шаблоны ищутся только точным совпадением
+MIN_FUZZY_LENGTH = 12
+
+# Сколько кандидатов из LSH сравнивается точно
+MAX_CANDIDATES = 32
+
+
+def make_template(text):
+    """Шаблон текста для сравнения и числа из него по порядку"""
+    text = unicodedata.normalize("NFC", text).casefold()
+    numbers = tuple(NUMBER_RE.findall(text))
+    template = NUMBER_RE.sub(_NUMBER_MARK, text)
+    return " ".join(template.split()), numbers
+
+
+def _shingles(template):
+    """Символьные триграммы шаблона"""
+    padded = f" {template} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+class _Entry:
+    """Запись памяти: шаблон перевода и числа исходного текста"""
+
+    __slots__ = ("key", "template", "shingles", "bands", "translation", "numbers", "mapped")
+
+    def __init__(self, key, template, translation, numbers):
+        self.key = key
+        self.template = template
+        self.shingles = None
+        self.bands = ()
+        self.numbers = numbers
+
+        # Числа исходного текста в переводе заменяются слотами по порядку:
+        # i-е число перевода - i-е число текста. Если чисел в переводе другое
+        # количество или порядок другой (иначе записаны, переставлены),
+        # подстановка невозможна - повторяющиеся числа не склеиваются в один слот
+        found = NUMBER_RE.findall(translation)
+        self.mapped = tuple(found) == numbers
+        if self.mapped:
+            positions = iter(range(len(numbers)))
+            self.translation = NUMBER_RE.sub(lambda m: _SLOT.format(next(positions)), translation)
+        else:
+            self.translation = translation
+
+    def render(self, numbers):
+        """Перевод с числами нового текста (None, если подставить нельзя)"""
+        if not self.mapped:
+            return self.translation if numbers == self.numbers else None
+        if len(numbers) != len(self.numbers):
+            return None
+        return _SLOT_RE.sub(lambda m: numbers[int(m.group(1))], self.translation)
+
+
+class TranslationMemory:
+    """
+    Память переводов с LRU-вытеснением.
+
+    threshold - минимальное сходство шаблонов (коэффициент Жаккара триграмм)
+    для повторного использования перевода; 1.0 - только тексты, отличающиеся
+    регистром, пробелами и числами
+    variant - дополнительная часть ключа (например, глоссарий), переводы
+    с разными вариантами не смешиваются
+    """
+
+    def __init__(self, threshold=1.0, max_entries=20000, num_perm=24, bands=8, seed=1):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.rows = num_perm // bands
+        self.bands = bands
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(self.rows * bands)]
+
+        self._entries = OrderedDict()
+        self._buckets = {}
+
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, text, target_lang, variant=""):
+        """Перевод похожего текста или None"""
+        template, numbers = make_template(text)
+        lang_key = f"{target_lang}|{variant}"
+
+        entry = self._entries.get((lang_key, template))
+        if entry is not None:
+            result = entry.render(numbers)
+            if result is not None:
+                self._entries.move_to_end(entry.key)
+                self.exact_hits += 1
+                return result
+
+        if self.threshold < 1.0 and len(template) >= MIN_FUZZY_LENGTH:
+            shingles = _shingles(template)
+            best, best_score = None, self.threshold
+            for candidate in self._candidates(lang_key, self._signature(shingles)):
+                score = _jaccard(shingles, candidate.shingles)
+                if score >= best_score:
+                    result = candidate.render(numbers)
+                    if result is not None:
+                        best, best_score = (candidate, result), score
+            if best is not None:
+                self._entries.move_to_end(best[0].key)
+                self.fuzzy_hits += 1
+                return best[1]
+
+        self.misses += 1
+        return None
+
+    def add(self, text, target_lang, translation, variant=""):
+        """Сохранение перевода, полученного от API"""
+        template, numbers = make_template(text)
+        if not template:
+            return
+        key = (f"{target_lang}|{variant}", template)
+        self._remove(key)
+
+        entry = self._entries[key] = _Entry(key, template, translation, numbers)
+        if len(template) >= MIN_FUZZY_LENGTH:
+            entry.shingles = _shingles(template)
+            entry.bands = self._band_keys(key[0], self._signature(entry.shingles))
+            for band in entry.bands:
+                self._buckets.setdefault(band, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+        }
+
+    def _signature(self, shingles):
+        """MinHash-подпись множества триграмм"""
+        hashes = [hash(shingle) & 0xFFFFFFFFFFFF for shingle in shingles]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, lang_key, signature):
+        rows = self.rows
+        return tuple(
+            (lang_key, band, hash(tuple(signature[band * rows:(band + 1) * rows])))
+            for band in range(self.bands)
+        )
+
+    def _candidates(self, lang_key, signature):
+        """
+        Записи, совпавшие с подписью хотя бы в одной полосе
+        (не больше MAX_CANDIDATES с наибольшим числом совпавших полос)
+        """
+        matches = Counter()
+        for band in self._band_keys(lang_key, signature):
+            matches.update(self._buckets.get(band, ()))
+        return [self._entries[key] for key, _ in matches.most_common(MAX_CANDIDATES)]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+
+__all__ = ['TranslationMemory', 'make_template']
@@ -0,0 +1,190 @@
+"""
+services/metrics.py - Счетчики и гистограммы в формате Prometheus
+"""
+
+import asyncio
+import functools
+import time
+
+# Границы гистограмм задержки, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Монотонно растущий счетчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    """Распределение значений по корзинам (для задержек)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики корзин..., сумма, количество]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        data = self._values.get(key)
+        if data is None:
+            data = self._values[key] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[index] += 1
+                break
+        data[-2] += value
+        data[-1] += 1
+
+    def render(self):
+        for key, data in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {data[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {data[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {data[-1]}"
+
+
+class GaugeFunc:
+    """Текущее значение, вычисляемое при выгрузке метрик"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def render(self):
+        yield f"{self.name} {self.func()}"
+
+
+class CounterFunc(GaugeFunc):
+    """Монотонно растущий счетчик, который ведет сам объект (например, кэш)"""
+
+    kind = "counter"
+
+
+def register(metric):
+    """Регистрация метрики (с тем же именем заменяет прежнюю)"""
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return register(Counter(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    return register(Histogram(name, help_text, labelnames, buckets))
+
+
+def gauge_func(name, help_text, func):
+    return register(GaugeFunc(name, help_text, func))
+
+
+def counter_func(name, help_text, func):
+    return register(CounterFunc(name, help_text, func))
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            lines.append(f"# {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+
+# Метрики обработчиков и API
+HANDLER_UPDATES = counter("bot_handler_updates_total", "Обработанные обновления", ["handler"])
+HANDLER_ERRORS = counter("bot_handler_errors_total", "Исключения в обработчиках", ["handler"])
+HANDLER_LATENCY = histogram("bot_handler_latency_seconds", "Время работы обработчика", ["handler"])
+API_REQUESTS = counter("translate_api_requests_total", "Запросы к API перевода", ["status"])
+API_LATENCY = histogram("translate_api_latency_seconds", "Время ответа API перевода", ["status"])
+TRANSLATED_CHARS = counter("translate_chars_total", "Символы, переведенные API (повторы не считаются)", ["lang"])
+QUOTA_REJECTIONS = counter("translate_quota_rejections_total", "Отказы из-за дневного лимита")
+
+
+def instrument(handler_name):
+    """Декоратор обработчика: счетчик вызовов, ошибок и гистограмма задержки"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            HANDLER_UPDATES.inc(handler=handler_name)
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(handler=handler_name)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started, handler=handler_name)
+
+        return wrapper
+
+    return decorator
+
+
+async def start_metrics_server(port, host="0.0.0.0"):
+    """HTTP-эндпоинт /metrics для сбора Prometheus"""
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if request_line.split(b" ")[1:2] == [b"/metrics"]:
+                status, body = "200 OK", render().encode()
+            else:
+                status, body = "404 Not Found", b""
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
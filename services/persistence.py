@@ -0,0 +1,424 @@
+"""
+services/persistence.py - Сохранение настроек пользователей и состояния диалогов
+
+Записи пользователей компактные: язык перевода и недавние языки хранятся
+номерами из таблицы кодов языков, название языка не хранится (берется
+из каталога), остальные ключи user_data - JSON. В памяти держатся только
+недавно писавшие пользователи (LRU), остальные читаются из SQLite при
+следующем обновлении. Язык автоперевода групп хранится отдельной таблицей
+только для групп, где он задан. Запись на диск - пачками в фоне (SqliteWriteBehind).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from services.inflight import inflight
+from services.sqlite_store import SqliteWriteBehind
+
+logger = logging.getLogger(__name__)
+
+# Ключи user_data, которые хранятся отдельными столбцами
+LANGUAGE_KEY = "target_lang"
+RECENT_KEY = "recent_langs"
+
+# Ключи, которые не сохраняются: название языка берется из каталога,
+# время начала диалога нужно только до перезапуска
+TRANSIENT_KEYS = {"lang_name", "dialog_at"}
+
+
+class CompactPersistence(BasePersistence):
+    """
+    Persistence для Application: user_data и диалоги ConversationHandler,
+    а также язык автоперевода групп (group_lang).
+
+    path - файл SQLite (":memory:" - только ограничение памяти, без сохранения)
+    max_users - сколько пользователей держать в памяти
+    conversation_timeout - через сколько секунд простоя диалог завершается и не восстанавливается
+    update_interval - как часто Application передает изменения, секунд
+    flush_interval - как часто изменения пишутся на диск, секунд
+    groups_interval - как часто перечитываются настройки групп (их меняют и другие воркеры), секунд
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS languages (
+            id INTEGER PRIMARY KEY,
+            code TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            lang INTEGER,
+            recent BLOB,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS groups (
+            chat_id INTEGER PRIMARY KEY,
+            lang TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state INTEGER NOT NULL,
+            updated INTEGER NOT NULL,
+            PRIMARY KEY (name, key)
+        );
+    """
+
+    def __init__(self, path=":memory:", max_users=10000, conversation_timeout=3600,
+                 update_interval=5, flush_interval=1.0, groups_interval=None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.max_users = max_users
+        self.conversation_timeout = conversation_timeout
+        self.db = SqliteWriteBehind(path, self.SCHEMA, flush_interval=flush_interval)
+
+        self._codes = {}
+        self._ids = {}
+        for language_id, code in self.db.query("SELECT id, code FROM languages"):
+            self._codes[code] = language_id
+            self._ids[language_id] = code
+        self._codes_lock = threading.Lock()
+
+        self._application = None
+        # Пользователи в памяти -> их запись, как она сохранена в SQLite
+        self._hot = OrderedDict()
+        self._evicted = set()
+        # Язык автоперевода групп: читается из памяти, таблица перечитывается в фоне
+        self.groups_interval = update_interval if groups_interval is None else groups_interval
+        self._groups = dict(self.db.query("SELECT chat_id, lang FROM groups"))
+        self._groups_version = 0
+        self._groups_next = time.monotonic() + self.groups_interval
+        self._groups_task = None
+        # Диалоги -> время последней смены состояния; простаивающие завершаются
+        self._dialogs = {}
+        self._dialogs_next = time.monotonic() + min(self.conversation_timeout, 60)
+
+    def attach(self, application):
+        """Application, из которого вытесняются давно не писавшие пользователи"""
+        self._application = application
+
+    # Номера языков
+
+    def _language_id(self, code):
+        language_id = self._codes.get(code)
+        if language_id is not None:
+            return language_id
+        with self._codes_lock:
+            # Новый код записывается сразу: номер назначает SQLite, он общий для процессов
+            self.db.execute_later("INSERT OR IGNORE INTO languages (code) VALUES (?)", (code,))
+            self.db.flush()
+            language_id = self.db.query("SELECT id FROM languages WHERE code = ?", (code,))[0][0]
+            self._codes[code] = language_id
+            self._ids[language_id] = code
+        return language_id
+
+    async def _resolve_codes(self, *records):
+        """
+        Номера новых кодов языков из user_data назначаются заранее в потоке,
+        чтобы запись и чтение SQLite в _language_id не шли на цикле событий
+        """
+        for data in records:
+            if not data:
+                continue
+            for code in (data.get(LANGUAGE_KEY), *(data.get(RECENT_KEY) or ())):
+                if code and code not in self._codes:
+                    await asyncio.to_thread(self._language_id, code)
+
+    def _language_code(self, language_id):
+        code = self._ids.get(language_id)
+        if code is None and language_id is not None:
+            # Код добавлен другим процессом
+            rows = self.db.query("SELECT code FROM languages WHERE id = ?", (language_id,))
+            if rows:
+                code = self._ids[language_id] = rows[0][0]
+                self._codes[code] = language_id
+        return code
+
+    # Записи пользователей
+
+    def _encode(self, data):
+        lang = data.get(LANGUAGE_KEY)
+        recent = data.get(RECENT_KEY)
+        extra = {
+            key: value for key, value in data.items()
+            if key not in (LANGUAGE_KEY, RECENT_KEY) and key not in TRANSIENT_KEYS
+        }
+        return (
+            self._language_id(lang) if lang else None,
+            array("H", (self._language_id(code) for code in recent)).tobytes() if recent else None,
+            json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else None,
+        )
+
+    def _decode(self, lang, recent, extra):
+        data = json.loads(extra) if extra else {}
+        code = self._language_code(lang)
+        if code:
+            data[LANGUAGE_KEY] = code
+        if recent:
+            codes = [self._language_code(language_id) for language_id in array("H", recent)]
+            data[RECENT_KEY] = [code for code in codes if code]
+        return data
+
+    def _store(self, user_id, data):
+        """Запись пользователя, если она изменилась с последнего сохранения"""
+        record = self._encode(data) if data else None
+        if user_id in self._hot:
+            if self._hot[user_id] == record:
+                return
+            self._hot[user_id] = record
+        self._write(user_id, record)
+
+    def _write(self, user_id, record):
+        if record is None:
+            self.db.execute_later("DELETE FROM users WHERE user_id = ?", (user_id,))
+            return
+        self.db.execute_later(
+            "INSERT INTO users (user_id, lang, recent, extra) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET "
+            "lang = excluded.lang, recent = excluded.recent, extra = excluded.extra",
+            (user_id, *record),
+        )
+
+    def _load(self, user_id):
+        """Запись пользователя из SQLite: (данные, запись как она хранится)"""
+        rows = self.db.query("SELECT lang, recent, extra FROM users WHERE user_id = ?", (user_id,))
+        if not rows:
+            return {}, None
+        return self._decode(*rows[0]), rows[0]
+
+    def _touch(self, user_id, record=None):
+        """Пользователь в горячем наборе; лишние вытесняются из Application"""
+        if user_id in self._hot:
+            self._hot.move_to_end(user_id)
+        else:
+            self._hot[user_id] = record
+        while len(self._hot) > self.max_users:
+            user_id = next(self._evictable(), None)
+            if user_id is None:
+                # Все заняты - вытеснение подождет следующего обновления
+                break
+            self._evict(user_id, self._hot.pop(user_id))
+
+    def _evictable(self):
+        """
+        Кандидаты на вытеснение, от давних к недавним. Пользователи с
+        выполняющейся работой пропускаются: обработчик еще пишет в их user_data
+        """
+        return (user_id for user_id in self._hot if not inflight.busy(user_id))
+
+    def _evict(self, user_id, saved):
+        if self._application is None:
+            return
+        data = self._application.user_data.get(user_id)
+        record = self._encode(data) if data else None
+        if record != saved:
+            # Несохраненные изменения записываются до вытеснения
+            self._write(user_id, record)
+        self._evicted.add(user_id)
+        self._application.drop_user_data(user_id)
+
+    def forget(self, user_id):
+        """
+        Пользователь перешел к этому воркеру: данные в памяти устарели,
+        при следующем обновлении они перечитываются из общего файла
+        """
+        self._hot.pop(user_id, None)
+        if self._application is not None and user_id in self._application.user_data:
+            self._evicted.add(user_id)
+            self._application.drop_user_data(user_id)
+
+    async def get_user_data(self):
+        # Пользователи загружаются по одному при первом обновлении (refresh_user_data)
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        self._maybe_expire_conversations()
+        if user_id in self._hot:
+            self._touch(user_id)
+            return
+        if user_id in self._evicted:
+            # Запись вытесненного пользователя еще может ждать сброса на диск
+            await asyncio.to_thread(self.db.flush)
+        data, record = self._load(user_id)
+        user_data.update(data)
+        if self._application is not None and len(self._hot) >= self.max_users:
+            # Данные вытесняемых пользователей будут записаны - их коды языков нужны заранее
+            evicted = list(itertools.islice(self._evictable(), len(self._hot) - self.max_users + 1))
+            await self._resolve_codes(*(self._application.user_data.get(uid) for uid in evicted))
+        self._touch(user_id, record)
+
+    async def update_user_data(self, user_id, data):
+        if not data and user_id not in self._hot:
+            # Пустая запись вытесненного пользователя: Application создал ее заново
+            # после вытеснения, а настройки пользователя остались в SQLite
+            return
+        await self._resolve_codes(data)
+        self._store(user_id, data)
+
+    async def drop_user_data(self, user_id):
+        if user_id in self._evicted:
+            # Вытеснение из памяти, а не удаление
+            self._evicted.discard(user_id)
+            data = self._application.user_data.get(user_id) if self._application is not None else None
+            if data:
+                # Пользователь успел вернуться, и его изменения нельзя потерять
+                await self._resolve_codes(data)
+                self._store(user_id, data)
+            return
+        self._hot.pop(user_id, None)
+        self.db.execute_later("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    # Настройки групп
+
+    def group_lang(self, chat_id):
+        """Язык автоперевода группы или None (без обращения к SQLite)"""
+        self._maybe_reload_groups()
+        return self._groups.get(chat_id)
+
+    def set_group_lang(self, chat_id, lang):
+        """Включение (lang) или выключение (None) автоперевода группы"""
+        self._groups_version += 1
+        if lang is None:
+            self._groups.pop(chat_id, None)
+            self.db.execute_later("DELETE FROM groups WHERE chat_id = ?", (chat_id,))
+            return
+        self._groups[chat_id] = lang
+        self.db.execute_later(
+            "INSERT INTO groups (chat_id, lang) VALUES (?, ?) "
+            "ON CONFLICT (chat_id) DO UPDATE SET lang = excluded.lang",
+            (chat_id, lang),
+        )
+
+    def _maybe_reload_groups(self):
+        if time.monotonic() < self._groups_next:
+            return
+        if self._groups_task is not None and not self._groups_task.done():
+            return
+        self._groups_next = time.monotonic() + self.groups_interval
+        self._groups_task = asyncio.get_running_loop().create_task(self._reload_groups())
+
+    async def _reload_groups(self):
+        """Настройки групп, измененные другими воркерами (cluster.py); запись и чтение - в потоке"""
+        version = self._groups_version
+
+        def read():
+            self.db.flush()
+            return dict(self.db.query("SELECT chat_id, lang FROM groups"))
+
+        try:
+            groups = await asyncio.to_thread(read)
+        except Exception:
+            logger.exception("Не удалось перечитать настройки групп")
+            return
+        if version == self._groups_version:
+            # Пока шло чтение, настройки не менялись - иначе прочитанное уже устарело
+            self._groups = groups
+
+    # Диалоги
+
+    async def get_conversations(self, name):
+        # Диалоги, в которых давно ничего не происходило, не восстанавливаются
+        oldest = int(time.time() - self.conversation_timeout)
+        self.db.execute_later("DELETE FROM conversations WHERE updated < ?", (oldest,))
+        rows = self.db.query(
+            "SELECT key, state, updated FROM conversations WHERE name = ? AND updated >= ?", (name, oldest)
+        )
+        conversations = {}
+        for key, state, updated in rows:
+            conversations[tuple(json.loads(key))] = state
+            self._dialogs[name, tuple(json.loads(key))] = updated
+        return conversations
+
+    async def update_conversation(self, name, key, new_state):
+        encoded = json.dumps(list(key), separators=(",", ":"))
+        if new_state is None:
+            self._dialogs.pop((name, key), None)
+            self.db.execute_later("DELETE FROM conversations WHERE name = ? AND key = ?", (name, encoded))
+            return
+        self.db.execute_later(
+            "INSERT INTO conversations (name, key, state, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name, key) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+            (name, encoded, new_state, int(time.time())),
+        )
+        self._dialogs[name, key] = int(time.time())
+
+    def _maybe_expire_conversations(self):
+        """
+        Завершение диалогов, простаивающих дольше conversation_timeout: иначе
+        таблица диалогов ConversationHandler в памяти только растет. Проверка
+        не чаще раза в минуту, удаление из SQLite - через update_persistence
+        """
+        if time.monotonic() < self._dialogs_next or self._application is None:
+            return
+        self._dialogs_next = time.monotonic() + min(self.conversation_timeout, 60)
+        oldest = time.time() - self.conversation_timeout
+        for name, key in [dialog for dialog, updated in self._dialogs.items() if updated < oldest]:
+            del self._dialogs[name, key]
+            conversations = self._application._conversation_handler_conversations.get(name)
+            if conversations is not None and key in conversations:
+                del conversations[key]
+
+    # Остальные данные не сохраняются (store_data)
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        self.db.flush()
+
+    def close(self):
+        self.db.close()
+
+
+def read_group_langs(path):
+    """
+    Язык автоперевода групп из файла состояния - для процесса без своего
+    CompactPersistence (фронт cluster.py). Файла или таблицы еще нет - пусто
+    """
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return {}
+    try:
+        return dict(conn.execute("SELECT chat_id, lang FROM groups"))
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+__all__ = ['CompactPersistence', 'read_group_langs']
@@ -0,0 +1,262 @@
+"""
+services/quota.py - Хранилища дневных лимитов пользователей и общих дневных счетчиков
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import date
+
+from services.sqlite_store import SqliteWriteBehind
+
+logger = logging.getLogger(__name__)
+
+
+def _today():
+    return date.today().isoformat()
+
+
+class QuotaStore:
+    """
+    Интерфейс хранилища лимитов. Счетчик привязан к дню, поэтому
+    с новым днем он обнуляется для каждого пользователя отдельно
+    """
+
+    def get(self, user_id):
+        """Сколько переводов пользователь сделал сегодня"""
+        raise NotImplementedError
+
+    def try_consume(self, user_id, limit, amount=1):
+        """
+        Атомарная проверка и списание: (True, новое значение) если
+        лимит позволяет, иначе (False, текущее значение)
+        """
+        raise NotImplementedError
+
+    def consume(self, user_id, amount=1):
+        """Списание без проверки лимита"""
+        raise NotImplementedError
+
+    def refund(self, user_id, amount=1):
+        """Возврат списанного (не ниже нуля)"""
+        raise NotImplementedError
+
+    def reset(self, user_id):
+        """Обнуление счетчика за сегодня, False если счетчика не было"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryQuotaStore(QuotaStore):
+    """Лимиты в памяти процесса: user_id -> (день, счетчик)"""
+
+    def __init__(self):
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def _load(self, user_id, today):
+        entry = self._usage.get(user_id)
+        if entry is None or entry[0] != today:
+            return None
+        return entry[1]
+
+    def _store(self, user_id, today, count):
+        self._usage[user_id] = (today, count)
+
+    def get(self, user_id):
+        with self._lock:
+            return self._load(user_id, _today()) or 0
+
+    def try_consume(self, user_id, limit, amount=1):
+        with self._lock:
+            today = _today()
+            used = self._load(user_id, today) or 0
+            if used + amount > limit:
+                return False, used
+            self._store(user_id, today, used + amount)
+            return True, used + amount
+
+    def consume(self, user_id, amount=1):
+        with self._lock:
+            today = _today()
+            used = (self._load(user_id, today) or 0) + amount
+            self._store(user_id, today, used)
+            return used
+
+    def refund(self, user_id, amount=1):
+        with self._lock:
+            today = _today()
+            used = self._load(user_id, today)
+            if used:
+                self._store(user_id, today, max(used - amount, 0))
+
+    def reset(self, user_id):
+        with self._lock:
+            today = _today()
+            if self._load(user_id, today) is None:
+                return False
+            self._store(user_id, today, 0)
+            return True
+
+
+class SqliteQuotaStore(MemoryQuotaStore):
+    """
+    Лимиты в SQLite (WAL). Проверка идет по счетчикам в памяти,
+    а изменения пишутся на диск пачками в фоне
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS quota (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day)
+        );
+        CREATE TABLE IF NOT EXISTS daily_counters (
+            name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (name, day)
+        );
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        super().__init__()
+        self.db = SqliteWriteBehind(path, self.SCHEMA, flush_interval=flush_interval)
+        # Счетчики прошлых дней больше не нужны
+        self.db.execute_later("DELETE FROM quota WHERE day < ?", (_today(),))
+        self.db.execute_later("DELETE FROM daily_counters WHERE day < ?", (_today(),))
+
+    def _load(self, user_id, today):
+        entry = self._usage.get(user_id)
+        if entry is not None and entry[0] == today:
+            return entry[1]
+
+        # Первое обращение за день - читаем с диска
+        rows = self.db.query(
+            "SELECT count FROM quota WHERE user_id = ? AND day = ?", (user_id, today)
+        )
+        if not rows:
+            self._usage.pop(user_id, None)
+            return None
+        self._usage[user_id] = (today, rows[0][0])
+        return rows[0][0]
+
+    def _store(self, user_id, today, count):
+        self._usage[user_id] = (today, count)
+        self.db.execute_later(
+            "INSERT INTO quota (user_id, day, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET count = excluded.count",
+            (user_id, today, count),
+        )
+
+    def forget(self, user_id):
+        """
+        Сброс счетчика в памяти: следующее обращение перечитает диск.
+        Ждет сброса записей, поэтому вызывается не на цикле событий
+        """
+        with self._lock:
+            self._usage.pop(user_id, None)
+        self.db.flush()
+
+    def close(self):
+        self.db.close()
+
+
+class DailyCounter:
+    """Счетчик за сегодня в памяти процесса (например, символы, отправленные в API)"""
+
+    def __init__(self):
+        self._day = _today()
+        self._value = 0
+
+    def _roll(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._value = 0
+
+    def get(self):
+        self._roll()
+        return self._value
+
+    def add(self, amount):
+        self._roll()
+        self._value += amount
+
+    def refresh_later(self):
+        """Перечитать общее значение в фоне (у счетчика в памяти его нет)"""
+
+
+class SqliteDailyCounter(DailyCounter):
+    """
+    Счетчик за сегодня, общий для процессов (воркеры cluster.py, экземпляры
+    webhook) через файл лимитов. Прибавления пишутся в фоне относительными
+    записями, а сумма других процессов перечитывается в отдельном потоке
+    не чаще раза в refresh_interval секунд, поэтому счетчик не ждет диска
+    """
+
+    def __init__(self, db, name, refresh_interval=1.0):
+        super().__init__()
+        self.db = db
+        self.name = name
+        self.refresh_interval = refresh_interval
+        # Прибавления этого процесса с последнего чтения
+        self._local = 0
+        self._value = self._read(self._day)
+        self._refreshed = time.monotonic()
+        self._task = None
+
+    def _read(self, day):
+        rows = self.db.query("SELECT value FROM daily_counters WHERE name = ? AND day = ?", (self.name, day))
+        return rows[0][0] if rows else 0
+
+    def _roll(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._value = 0
+            self._local = 0
+
+    def get(self):
+        self._roll()
+        return self._value + self._local
+
+    def add(self, amount):
+        self._roll()
+        self._local += amount
+        self.db.execute_later(
+            "INSERT INTO daily_counters (name, day, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (name, day) DO UPDATE SET value = value + excluded.value",
+            (self.name, self._day, amount),
+        )
+
+    def refresh_later(self):
+        if time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        if self._task is not None and not self._task.done():
+            return
+        self._refreshed = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self):
+        day, local = self._day, self._local
+
+        def read():
+            # Свои прибавления - на диск, затем сумма всех процессов
+            self.db.flush()
+            return self._read(day)
+
+        try:
+            value = await asyncio.to_thread(read)
+        except Exception:
+            logger.exception("Не удалось перечитать дневной счетчик", extra={"counter": self.name})
+            return
+        if day == self._day:
+            # Прибавления, сделанные во время чтения, до следующего чтения могут
+            # учитываться дважды - бюджет от этого только строже
+            self._value = value
+            self._local -= local
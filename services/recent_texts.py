@@ -0,0 +1,44 @@
+"""
+services/recent_texts.py - Исходные тексты последних ответов быстрого перевода
+"""
+
+import zlib
+from collections import OrderedDict
+
+# Тексты длиннее этого сжимаются
+_COMPRESS_FROM = 256
+
+
+class RecentTextStore:
+    """
+    Ограниченное хранилище (chat_id, message_id) -> исходный текст.
+    Старые записи вытесняются, длинные тексты хранятся сжатыми
+    """
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def put(self, chat_id, message_id, text):
+        raw = text.encode()
+        if len(raw) >= _COMPRESS_FROM:
+            packed = (True, zlib.compress(raw))
+        else:
+            packed = (False, raw)
+
+        key = (chat_id, message_id)
+        self._data[key] = packed
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, chat_id, message_id):
+        packed = self._data.get((chat_id, message_id))
+        if packed is None:
+            return None
+        self._data.move_to_end((chat_id, message_id))
+        compressed, raw = packed
+        return (zlib.decompress(raw) if compressed else raw).decode()
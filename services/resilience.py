@@ -0,0 +1,201 @@
+"""
+services/resilience.py - Повторы, автоматический выключатель и дублирующие запросы к API
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import httpx
+
+from services.deadline import remaining
+from services.errors import CircuitOpenError, TranslateApiError
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(error):
+    """Временная ошибка, после которой есть смысл повторить запрос"""
+    if isinstance(error, TranslateApiError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def backoff_delay(attempt, base, cap):
+    """Экспоненциальная задержка со случайным разбросом (full jitter)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд запросы не отправляются
+    reset_timeout секунд, затем пропускается один пробный запрос
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+
+    def is_open(self):
+        """Запросы сейчас отклоняются без попытки"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        """Проверка перед запросом, выбрасывает CircuitOpenError"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Сервис перевода временно недоступен")
+            self.state = self.HALF_OPEN
+            self.probe_at = time.monotonic()
+        elif self.state == self.HALF_OPEN:
+            # Пробный запрос уже отправлен; если он завис дольше reset_timeout - пропускаем новый
+            if time.monotonic() - self.probe_at < self.reset_timeout:
+                raise CircuitOpenError("Сервис перевода временно недоступен")
+            self.probe_at = time.monotonic()
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("API недоступно, пауза", extra={"pause_s": self.reset_timeout})
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """Пробный запрос отменен (срок, /cancel) - результата нет, пауза начинается заново"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Скользящее окно времени ответа для оценки p95"""
+
+    def __init__(self, size=200, min_samples=20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        """Перцентиль q (0..1) или None, пока данных мало"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class ResilientCaller:
+    """
+    Вызов API с повторами временных ошибок, автоматическим выключателем
+    и (по желанию) дублирующим запросом, если ответ дольше p95
+    """
+
+    def __init__(
+        self,
+        retries=3,
+        backoff_base=0.2,
+        backoff_max=3.0,
+        breaker=None,
+        hedge=False,
+        hedge_min_delay=0.3,
+        hedge_allowed=None,
+    ):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        # Проверка, можно ли сейчас тратить бюджет на дублирующий запрос
+        self.hedge_allowed = hedge_allowed or (lambda: True)
+
+    async def call(self, func):
+        """Выполнение корутины func() с повторами"""
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                result = await self._timed(func)
+            except BaseException as e:
+                if not isinstance(e, Exception):
+                    # Отмена: иначе выключатель навсегда остался бы в HALF_OPEN
+                    self.breaker.record_abandoned()
+                    raise
+                if not is_retryable(e):
+                    # Ошибка запроса, а не сервиса - выключатель не трогаем
+                    if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                        self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.retries:
+                    raise
+
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if isinstance(e, TranslateApiError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                left = remaining()
+                if left is not None and delay >= left:
+                    # Повтор не успеет к сроку обработки
+                    raise
+                logger.warning("Повтор запроса", extra={"delay_s": round(delay, 3), "error": str(e)})
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def _timed(self, func):
+        """Вызов с замером времени и дублированием медленных запросов"""
+        started = time.monotonic()
+        threshold = self.latency.percentile(0.95) if self.hedge else None
+        if threshold is None:
+            result = await func()
+        else:
+            result = await self._hedged(func, max(threshold, self.hedge_min_delay))
+        self.latency.add(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, func, delay):
+        """Если ответа нет за delay секунд, отправляется второй такой же запрос"""
+        first = asyncio.ensure_future(func())
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            # asyncio.wait не отменяет ожидаемые задачи - запрос отменяется явно
+            first.cancel()
+            raise
+        if done or not self.hedge_allowed():
+            return await first
+
+        second = asyncio.ensure_future(func())
+        tasks = {first, second}
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not tasks:
+                    # Оба запроса завершились ошибкой
+                    return done.pop().result()
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,184 @@
+"""
+services/send_scheduler.py - Планировщик исходящих запросов к Bot API
+
+Подключается к Application как rate limiter: все вызовы Bot API проходят
+через общее ведро токенов (~30 сообщений в секунду) и ведро своего чата
+(~1 сообщение в секунду в личке, ~20 в минуту в группе). Ответы пользователю
+уходят раньше служебных действий ("печатает"), а повторные действия в тот же
+чат не отправляются. RetryAfter от Telegram приостанавливает чат (или всех)
+на указанное время, после чего запрос повторяется.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from services import metrics
+from services.deadline import remaining
+from services.governor import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: ответы пользователю раньше служебных действий
+PRIORITY_REPLY = 0
+PRIORITY_ACTION = 1
+
+# Ответы на нажатия и inline-запросы: без ожидания, Telegram ждет их несколько секунд
+IMMEDIATE_ENDPOINTS = {"answerCallbackQuery", "answerInlineQuery"}
+
+# Действие "печатает" показывается около 5 секунд - чаще отправлять незачем
+ACTION_TTL = 4.0
+
+# Сколько ведер чатов хранить (простаивающие удаляются)
+MAX_CHAT_BUCKETS = 10000
+
+RETRY_AFTER = metrics.counter("telegram_retry_after_total", "Ответы RetryAfter от Bot API")
+ACTIONS_SKIPPED = metrics.counter("telegram_actions_skipped_total", "Несрочные действия, которые не отправлены")
+
+
+def _seconds(retry_after):
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class SendScheduler(BaseRateLimiter):
+    """
+    global_rate - запросов в секунду на бота
+    chat_rate / group_rate - запросов в секунду в личный чат / в группу
+    max_retries - сколько раз повторять запрос после RetryAfter
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1.0, group_rate=20 / 60, burst=3, max_retries=2):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_retries = max_retries
+
+        self._chats = {}
+        self._last_action = {}
+        self._queue = []
+        self._seq = itertools.count()
+        self._dispatcher = None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._prune()
+            rate = self.group_rate if isinstance(chat_id, int) and chat_id < 0 else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, capacity=self.burst)
+        return bucket
+
+    def _prune(self):
+        """Удаление ведер чатов, которые уже полностью восстановились"""
+        for chat_id, bucket in list(self._chats.items()):
+            if bucket.wait_time(bucket.capacity) == 0:
+                del self._chats[chat_id]
+        now = time.monotonic()
+        for chat_id, (_, sent_at) in list(self._last_action.items()):
+            if now - sent_at >= ACTION_TTL:
+                del self._last_action[chat_id]
+
+    def _wait_time(self, chat_id):
+        wait = self.global_bucket.wait_time(1)
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).wait_time(1))
+        return wait
+
+    def _take(self, chat_id):
+        self.global_bucket.consume(1)
+        if chat_id is not None:
+            self._chat_bucket(chat_id).consume(1)
+
+    async def _acquire(self, chat_id, priority):
+        """Ожидание своей очереди в рамках общего лимита и лимита чата"""
+        if not self._queue and self._wait_time(chat_id) == 0:
+            self._take(chat_id)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((priority, next(self._seq), chat_id, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """
+        Выдача разрешений по приоритету. Запрос в чат, исчерпавший свой лимит,
+        не задерживает запросы в другие чаты
+        """
+        while self._queue:
+            self._queue = [item for item in self._queue if not item[3].done()]
+            self._queue.sort(key=lambda item: item[:2])
+
+            wait = None
+            for item in self._queue:
+                item_wait = self._wait_time(item[2])
+                if item_wait == 0:
+                    self._queue.remove(item)
+                    self._take(item[2])
+                    item[3].set_result(None)
+                    break
+                wait = item_wait if wait is None else min(wait, item_wait)
+            else:
+                if wait is not None:
+                    await asyncio.sleep(wait)
+
+    def _skip_action(self, chat_id, action):
+        """
+        Несрочное действие не отправляется, если такое же недавно ушло в этот чат
+        или если для него пришлось бы ждать лимита (или срок обработки истек)
+        """
+        if remaining() == 0:
+            # Срок обработки истек - "печатает" уже ни к чему
+            return True
+        last = self._last_action.get(chat_id)
+        if last is not None and last[0] == action and time.monotonic() - last[1] < ACTION_TTL:
+            return True
+        return bool(self._queue) or self._wait_time(chat_id) > 0
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in IMMEDIATE_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        chat_id = data.get("chat_id")
+        priority = PRIORITY_REPLY
+
+        if endpoint == "sendChatAction":
+            action = data.get("action")
+            if self._skip_action(chat_id, action):
+                ACTIONS_SKIPPED.inc()
+                return True
+            self._last_action[chat_id] = (action, time.monotonic())
+            priority = PRIORITY_ACTION
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                RETRY_AFTER.inc()
+                if attempt >= self.max_retries:
+                    raise
+                delay = _seconds(e.retry_after)
+                logger.warning("Лимит Bot API, пауза", extra={"endpoint": endpoint, "chat_id": chat_id, "delay": delay})
+                # Пауза для чата, а если запрос не к чату - для всех
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+                bucket.pause(delay)
+
+
+__all__ = ['SendScheduler', 'PRIORITY_REPLY', 'PRIORITY_ACTION']
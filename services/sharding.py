@@ -0,0 +1,165 @@
+"""
+services/sharding.py - Распределение пользователей по процессам-воркерам
+
+Пользователь закрепляется за воркером по согласованному хэшированию user_id,
+поэтому при добавлении или удалении воркера переезжает лишь малая часть
+пользователей. Переезд откладывается, пока у пользователя есть необработанные
+обновления или он недавно писал: порядок обновлений и состояние диалога
+остаются на одном воркере.
+"""
+
+import bisect
+import hashlib
+import time
+
+# Сколько прежних составов кольца помнит ShardRouter; при более частых
+# изменениях каждый новый ключ считается переехавшим
+RING_HISTORY = 16
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Согласованное хэширование с виртуальными узлами"""
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def snapshot(self):
+        """Копия кольца в текущем составе"""
+        ring = HashRing(replicas=self.replicas)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        ring.nodes = set(self.nodes)
+        return ring
+
+    def node_for(self, key):
+        """Узел, отвечающий за ключ (None, если узлов нет)"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class _Assignment:
+    __slots__ = ("node", "pending", "last_seen")
+
+    def __init__(self, node, now):
+        self.node = node
+        self.pending = 0
+        self.last_seen = now
+
+
+class ShardRouter:
+    """
+    Маршрутизация ключей (пользователей) по воркерам с закреплением.
+
+    Ключ остается у текущего воркера, пока у него есть необработанные
+    обновления или с последнего обновления прошло меньше sticky_idle секунд,
+    даже если по кольцу он уже принадлежит другому воркеру.
+    """
+
+    def __init__(self, ring, sticky_idle=60.0, clock=time.monotonic):
+        self.ring = ring
+        self.sticky_idle = sticky_idle
+        self.clock = clock
+        self._assigned = {}
+        # Составы кольца, по которым уже шла маршрутизация (None - их было слишком много)
+        self._history = []
+
+    def route(self, key):
+        """
+        Воркер для очередного обновления ключа: (воркер, fresh).
+        fresh=True - ключ мог обрабатываться другим воркером, и этот должен
+        перечитать данные пользователя из общего хранилища
+        """
+        now = self.clock()
+        target = self.ring.node_for(key)
+        entry = self._assigned.get(key)
+
+        if entry is None:
+            # Закрепление забыто (prune) или ключ новый: воркер меняется, только
+            # если при прежнем составе кольца ключ принадлежал другому воркеру
+            entry = self._assigned[key] = _Assignment(target, now)
+            fresh = self._moved(key, target)
+        elif entry.node != target and not entry.pending and (
+            entry.node not in self.ring.nodes or now - entry.last_seen >= self.sticky_idle
+        ):
+            # Кольцо изменилось, а обновлений в работе нет и пользователь давно
+            # не писал (или его воркер остановлен) - переезд
+            entry.node = target
+            fresh = True
+        else:
+            fresh = False
+
+        entry.pending += 1
+        entry.last_seen = now
+        return entry.node, fresh
+
+    def _moved(self, key, target):
+        """Принадлежал ли ключ другому воркеру при одном из прежних составов кольца"""
+        if self._history is not None and (not self._history or self._history[-1].nodes != self.ring.nodes):
+            self._history.append(self.ring.snapshot())
+            if len(self._history) > RING_HISTORY:
+                self._history = None
+        if self._history is None:
+            return True
+        return any(ring.node_for(key) != target for ring in self._history)
+
+    def done(self, key):
+        """Воркер закончил обработку обновления ключа"""
+        entry = self._assigned.get(key)
+        if entry is not None and entry.pending:
+            entry.pending -= 1
+
+    def pending(self, node):
+        """Необработанные обновления воркера"""
+        return sum(entry.pending for entry in self._assigned.values() if entry.node == node)
+
+    def node_lost(self, node):
+        """Воркер упал: его обновления потеряны, пользователи переезжают сразу"""
+        self.ring.remove(node)
+        for key in [key for key, entry in self._assigned.items() if entry.node == node]:
+            del self._assigned[key]
+
+    def prune(self):
+        """Забыть закрепления пользователей, давно не присылавших обновлений"""
+        now = self.clock()
+        stale = [
+            key for key, entry in self._assigned.items()
+            if not entry.pending and now - entry.last_seen >= self.sticky_idle
+        ]
+        for key in stale:
+            del self._assigned[key]
+        return len(stale)
+
+
+__all__ = ['HashRing', 'ShardRouter']
@@ -0,0 +1,50 @@
+"""
+services/singleflight.py - Один запрос к API на одинаковые одновременные переводы
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Таблица выполняющихся запросов: первый вызов с ключом делает работу,
+    остальные ждут тот же результат (или ту же ошибку)
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiters = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key, func):
+        """Выполнение func() один раз на ключ среди одновременных вызовов"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self._waiters[task] = 0
+            # Ключ освобождается сразу после завершения, чтобы ошибки не кэшировались
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        self._waiters[task] += 1
+        try:
+            # shield: отмена одного ожидающего не отменяет запрос для остальных
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Запрос больше никому не нужен - отменяем его
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._waiters.pop(task, None)
+        # Ошибка уже передана ожидающим
+        if not task.cancelled():
+            task.exception()
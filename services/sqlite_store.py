@@ -0,0 +1,90 @@
+"""
+services/sqlite_store.py - SQLite в режиме WAL с отложенной пакетной записью
+"""
+
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteWriteBehind:
+    """
+    Соединение с SQLite, где запись копится в памяти и сбрасывается
+    одной транзакцией в фоновом потоке раз в flush_interval секунд,
+    поэтому обработчики никогда не ждут записи на диск. Чтение идет через
+    отдельное соединение: в режиме WAL оно не ждет идущего сброса
+    """
+
+    def __init__(self, path, schema, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(schema)
+
+        self._lock = threading.Lock()
+        if path == ":memory:":
+            # Вторым соединением была бы другая база; без диска сброс быстрый
+            self._reader, self._read_lock = self._conn, self._lock
+        else:
+            self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._read_lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name=f"sqlite-flush:{path}", daemon=True)
+        self._thread.start()
+
+    def execute_later(self, sql, params=()):
+        """Запись будет выполнена при следующем сбросе"""
+        with self._lock:
+            self._pending.append((sql, params))
+
+    def query(self, sql, params=()):
+        """Чтение с учетом уже сброшенных записей"""
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def flush(self):
+        """Запись накопленных изменений одной транзакцией"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+
+            # Подряд идущие одинаковые запросы выполняются через executemany
+            self._conn.execute("BEGIN")
+            try:
+                start = 0
+                while start < len(pending):
+                    sql = pending[start][0]
+                    end = start
+                    while end < len(pending) and pending[end][0] == sql:
+                        end += 1
+                    self._conn.executemany(sql, [params for _, params in pending[start:end]])
+                    start = end
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка записи в SQLite", extra={"path": self.path})
+
+    def close(self):
+        """Остановка фонового потока и финальный сброс"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        if self._reader is not self._conn:
+            self._reader.close()
+        self._conn.close()
@@ -0,0 +1,97 @@
+"""
+services/update_processor.py - Параллельная обработка обновлений с сохранением порядка для пользователя
+"""
+
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from services.deadline import deadline_scope
+from services.inflight import inflight
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обновления разных пользователей обрабатываются параллельно,
+    а обновления одного пользователя - строго по очереди
+    (от этого зависит состояние ConversationHandler).
+
+    deadline - срок обработки обновления с момента получения, секунд
+    interrupt_commands - команды, которые не ждут очереди пользователя,
+    а отменяют его выполняющееся обновление (например, /cancel)
+    """
+
+    __slots__ = ("_locks", "_waiters", "deadline", "interrupt_commands")
+
+    def __init__(self, max_concurrent_updates, deadline=None, interrupt_commands=("cancel",)):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+        self._waiters = {}
+        self.deadline = deadline
+        self.interrupt_commands = {f"/{command}" for command in interrupt_commands}
+
+    @staticmethod
+    def _update_key(update):
+        """Ключ очереди: пользователь, а если его нет - чат"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    def _is_interrupt(self, update):
+        message = update.message
+        if message is None or not message.text or not message.text.startswith("/"):
+            return False
+        command = message.text.split(maxsplit=1)[0].split("@", 1)[0]
+        return command in self.interrupt_commands
+
+    async def process_update(self, update, coroutine):
+        """
+        Сначала очередь пользователя, потом общий слот обработки: обновления,
+        ждущие своей очереди, не занимают слоты и не задерживают других
+        """
+        # Срок отсчитывается от получения обновления, включая ожидание в очереди
+        with deadline_scope(self.deadline):
+            key = self._update_key(update)
+            if key is None:
+                async with self._semaphore:
+                    await coroutine
+                return
+
+            if self._is_interrupt(update):
+                inflight.cancel(key)
+
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = asyncio.Lock()
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+
+            try:
+                async with lock:
+                    async with self._semaphore:
+                        await self.do_process_update(update, coroutine)
+            finally:
+                # Удаление замка, когда у пользователя больше нет обновлений в очереди
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+                    del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        with inflight.track(self._update_key(update)):
+            try:
+                await coroutine
+            except asyncio.CancelledError:
+                # Отмена пользователем (/cancel) или при остановке бота
+                if not inflight.interrupted():
+                    raise
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
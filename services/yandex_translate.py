@@ -2,125 +2,496 @@
 services/yandex_translate.py - работа с API
 """
 
-import os
-import requests
-from dotenv import load_dotenv
-from datetime import datetime, date
+import asyncio
+import logging
+import time
 
-load_dotenv()
+import httpx
+
+from config import (
+    YANDEX_API_KEY, YANDEX_FOLDER_ID, YANDEX_TRANSLATE_URL,
+    YANDEX_LANGUAGES_URL, LANGUAGES_REFRESH_INTERVAL,
+    HTTP_POOL_SIZE, HTTP_KEEPALIVE_CONNECTIONS,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    BATCH_WINDOW_MS, BATCH_MAX_TEXTS, BATCH_MAX_CHARS,
+    CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL,
+    CACHE_DB_PATH, CACHE_DB_TTL, CACHE_HITS_COUNT,
+    DAILY_LIMIT, QUOTA_BACKEND, QUOTA_DB_PATH, QUOTA_FLUSH_INTERVAL,
+    API_REQUESTS_PER_SECOND, API_CHARS_PER_SECOND, API_DAILY_CHARS, API_QUEUE_SIZE,
+    API_RETRIES, API_BACKOFF_BASE, API_BACKOFF_MAX,
+    BREAKER_FAILURES, BREAKER_RESET_TIMEOUT, HEDGE_ENABLED, HEDGE_MIN_DELAY,
+    TM_ENABLED, TM_THRESHOLD, TM_MAX_ENTRIES, GLOSSARY_PATH
+)
+from services.batcher import TranslationBatcher
+from services.chunking import split_text
+from services.http import ssl_context
+from services.deadline import check_deadline, deadline_limit, remaining
+from services.cache import MemoryCache, SqliteCache, TranslationCache, make_key
+from services.resilience import CircuitBreaker, ResilientCaller
+from services.quota import DailyCounter, MemoryQuotaStore, SqliteDailyCounter, SqliteQuotaStore
+from services.singleflight import SingleFlight
+from services.errors import (
+    TranslateApiError, TranslatorUnavailable, OverloadedError, CircuitOpenError,
+    QuotaExceededError
+)
+from services.governor import ApiGovernor, PRIORITY_QUICK, PRIORITY_BULK
+from services.glossary import GlossaryStore
+from services.langdetect import detect_language
+from services.languages import LanguageCatalog
+from services.memory import TranslationMemory
+from services.log import text_fields
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста в одном переводе (длинные тексты делятся на части)
+MAX_TEXT_LENGTH = 1000
 
 class SimpleTranslator:
     """Переводчик"""
     
-    def __init__(self):
-        self.api_key = os.getenv("YANDEX_API_KEY")
-        self.folder_id = os.getenv("YANDEX_FOLDER_ID")
+    def __init__(
+        self,
+        pool_size=HTTP_POOL_SIZE,
+        keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        quota=None,
+    ):
+        self.api_key = YANDEX_API_KEY
+        self.folder_id = YANDEX_FOLDER_ID
         
         if not self.api_key or not self.folder_id:
-            print("API_KEY и FOLDER_ID отсутствуют в .env")
             raise ValueError("API_KEY и FOLDER_ID отсутствуют в .env")
         
         # Лимит на каждого пользователя 20 переводов в день
-        self.max_uses_per_user = 20 
-        self.user_usage = {}
-        self.current_date = date.today()
+        self.max_uses_per_user = DAILY_LIMIT
+        self.quota = quota or self._create_quota_store()
+
+        # Настройки общего пула соединений (сам клиент создается при первом запросе)
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=keepalive_connections,
+        )
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._client = None
+        self._client_loop = None
+
+        # Объединение одновременных переводов в один запрос
+        self.batcher = TranslationBatcher(
+            self._request_translations,
+            window=BATCH_WINDOW_MS / 1000,
+            max_texts=BATCH_MAX_TEXTS,
+            max_chars=BATCH_MAX_CHARS,
+        )
+
+        # Кэш готовых переводов
+        self.cache = TranslationCache(
+            MemoryCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL),
+            SqliteCache(CACHE_DB_PATH, ttl=CACHE_DB_TTL) if CACHE_DB_PATH else None,
+        )
+        # Засчитываются ли переводы из кэша в дневной лимит
+        self.cache_hits_count = CACHE_HITS_COUNT
+
+        # Переводы того же текста с другими числами, регистром, пробелами без запроса к API
+        self.memory = TranslationMemory(TM_THRESHOLD, TM_MAX_ENTRIES) if TM_ENABLED else None
+
+        # Общий глоссарий терминов
+        self.glossaries = GlossaryStore(GLOSSARY_PATH)
+
+        # Языки из API (до загрузки - встроенный список)
+        self.languages = LanguageCatalog(self._fetch_languages, LANGUAGES_REFRESH_INTERVAL)
+
+        # Одинаковые одновременные переводы выполняются одним запросом
+        self.inflight = SingleFlight()
+
+        # Общий бюджет запросов и символов перед API
+        self.governor = ApiGovernor(
+            requests_per_second=API_REQUESTS_PER_SECOND,
+            chars_per_second=API_CHARS_PER_SECOND,
+            daily_chars=API_DAILY_CHARS,
+            max_queue=API_QUEUE_SIZE,
+            # Дневной бюджет общий для процессов вместе с лимитами (QUOTA_BACKEND=sqlite)
+            day_chars=(
+                SqliteDailyCounter(self.quota.db, "api_chars") if isinstance(self.quota, SqliteQuotaStore)
+                else DailyCounter()
+            ),
+        )
+
+        # Повторы временных ошибок, выключатель и дублирование медленных запросов
+        self.resilience = ResilientCaller(
+            retries=API_RETRIES,
+            backoff_base=API_BACKOFF_BASE,
+            backoff_max=API_BACKOFF_MAX,
+            breaker=CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_TIMEOUT),
+            hedge=HEDGE_ENABLED,
+            hedge_min_delay=HEDGE_MIN_DELAY,
+            hedge_allowed=self.governor.is_idle,
+        )
         
-        print("Переводчик готов к работе")
+        self._register_metrics()
+        logger.info("Переводчик готов к работе")
+
+    def _get_client(self):
+        """Общий HTTP-клиент с keep-alive соединениями"""
+        # Соединения привязаны к циклу событий: в serverless цикл может смениться между вызовами
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client_loop = loop
+            self._client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                verify=ssl_context(),
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Api-Key {self.api_key}"
+                },
+            )
+        return self._client
+
+    async def close(self):
+        """Закрытие пула соединений и кэша"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.cache.close()
+        self.quota.close()
+
+    def flush(self):
+        """Немедленная запись отложенных изменений на диск"""
+        if isinstance(self.quota, SqliteQuotaStore):
+            self.quota.db.flush()
+        if self.cache.disk is not None:
+            self.cache.disk.db.flush()
+
+    def _register_metrics(self):
+        """Показатели кэша, очереди и выключателя для /metrics"""
+        metrics.gauge_func("translate_cache_entries", "Записей в кэше в памяти", lambda: len(self.cache.memory))
+        metrics.gauge_func("translate_cache_bytes", "Объем кэша в памяти", lambda: self.cache.memory.size_bytes)
+        metrics.counter_func("translate_cache_hits_total", "Попадания в кэш в памяти", lambda: self.cache.memory.hits)
+        metrics.counter_func("translate_cache_misses_total", "Промахи кэша в памяти", lambda: self.cache.memory.misses)
+        metrics.counter_func("translate_cache_evictions_total", "Вытеснения из кэша", lambda: self.cache.memory.evictions)
+        if self.memory is not None:
+            metrics.gauge_func("translate_memory_entries", "Записей в памяти переводов", lambda: len(self.memory))
+            metrics.counter_func(
+                "translate_memory_exact_hits_total", "Совпадения шаблона в памяти переводов", lambda: self.memory.exact_hits
+            )
+            metrics.counter_func(
+                "translate_memory_fuzzy_hits_total", "Похожие тексты в памяти переводов", lambda: self.memory.fuzzy_hits
+            )
+        metrics.gauge_func("translate_api_queue", "Запросов в очереди к API", lambda: len(self.governor._queue))
+        metrics.gauge_func("translate_api_day_chars", "Символов отправлено сегодня", lambda: self.governor.usage()["day_chars"])
+        metrics.gauge_func(
+            "translate_api_circuit_open", "Выключатель API разомкнут", lambda: int(self.resilience.breaker.is_open())
+        )
+
+    @staticmethod
+    def _create_quota_store():
+        """Хранилище лимитов по настройке QUOTA_BACKEND"""
+        if QUOTA_BACKEND == "sqlite":
+            return SqliteQuotaStore(QUOTA_DB_PATH, flush_interval=QUOTA_FLUSH_INTERVAL)
+        return MemoryQuotaStore()
+
+    def _consume(self, user_id, amount=1):
+        """Атомарная проверка лимита и списание переводов"""
+        allowed, used = self.quota.try_consume(user_id, self.max_uses_per_user, amount)
+        if not allowed:
+            metrics.QUOTA_REJECTIONS.inc()
+            logger.info("Лимит исчерпан", extra={"user_id": user_id, "used": used})
+        return allowed
 
-    def _get_user_key(self, user_id, current_date):
-        """Запоминание пользователя"""
-        return f"{user_id}_{current_date}"
-    
     def can_user_translate(self, user_id):
         """Проверка лимита пользователя"""
-        # Сброс счетчика лимитов с нового дня
-        today = date.today()
-        if today != self.current_date:
-            self.user_usage = {}
-            self.current_date = today
-            print("Сбросил счетчики")
-        
-        user_key = self._get_user_key(user_id, today)
-        user_count = self.user_usage.get(user_key, 0)
+        user_count = self.quota.get(user_id)
         
         if user_count >= self.max_uses_per_user:
             return False, f"Вы использовали {user_count} из {self.max_uses_per_user} переводов сегодня"
         
         return True, ""     
+
+    def charge(self, user_id, amount=1):
+        """Списание переводов, выполненных без списания (inline-режим, файлы)"""
+        return self._consume(user_id, amount)
+
+    def refund(self, user_id, amount=1):
+        """Возврат списанных, но не понадобившихся переводов"""
+        if amount > 0:
+            self.quota.refund(user_id, amount)
     
-    def translate(self, text, target_lang="ru", user_id=None):
+    async def translate(
+        self, text, target_lang="ru", user_id=None, priority=PRIORITY_QUICK, source_lang=None, user_glossary=None
+    ):
         """
         Осуществление переврода
         text - текст для перевода
         target_lang - язык перевода (например, "ru", "en")
+        priority - приоритет в очереди к API (PRIORITY_*)
+        source_lang - язык текста; если не указан, определяется локально
+        user_glossary - личные термины пользователя ({"en-ru": {термин: перевод}})
+
+        Текст, уже написанный на языке перевода, возвращается без запроса
+        и без списания лимита. Если API перегружено, выбрасывает TranslatorUnavailable
         """
         if not text or not text.strip():
             return text
 
-        # Проверяка лимита пользователя
-        if user_id:
-            can_translate, error = self.can_user_translate(user_id)
-            if not can_translate:
-                return None, error
-        
+        source_lang = source_lang or detect_language(text)
+        if source_lang == target_lang:
+            return text
+
         # Проверка длины текста
-        if len(text) > 1000:
-            return None, "Текст слишком длинный (максимум 1000 символов)"
-        
-        # URL для API
-        url = "https://translate.api.cloud.yandex.net/translate/v2/translate"
-        
-        # Заголовки запроса
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Api-Key {self.api_key}"
-        }
-        
+        if len(text) > MAX_TEXT_LENGTH:
+            logger.info("Текст слишком длинный", extra={"max_length": MAX_TEXT_LENGTH})
+            return None
+
+        glossary = self.glossaries.select(text, source_lang, target_lang, user_glossary)
+
+        # Готовый перевод из кэша или памяти переводов
+        cached = await self._lookup(text, target_lang, source_lang, glossary)
+        if cached is not None:
+            if user_id and self.cache_hits_count and not self._consume(user_id):
+                return None
+            return cached
+
+        # Срок истек в очереди - запрос к API уже не нужен
+        check_deadline()
+        self._check_available()
+
+        # Проверка лимита пользователя и списание перевода
+        if user_id and not self._consume(user_id):
+            return None
+
+        translated_text = None
+        try:
+            # По сроку или при отмене ожидание прерывается, а ненужный запрос к API отменяется
+            async with deadline_limit():
+                translated_text = await self._translate_shared(text, target_lang, priority, source_lang, glossary)
+            return translated_text
+                
+        except TranslateApiError as e:
+            logger.warning("Ошибка API", extra={"status": e.status_code, "error": e.message, **text_fields(text)})
+            return None
+        except TranslatorUnavailable:
+            raise
+        except Exception as e:
+            logger.warning("Ошибка при запросе", extra={"error": repr(e), **text_fields(text)})
+            return None
+        finally:
+            # Перевод засчитывается только при успехе
+            if user_id and translated_text is None:
+                self.quota.refund(user_id)
+
+    def split_long_text(self, text):
+        """Деление длинного текста на части для translate_chunks"""
+        return split_text(text, MAX_TEXT_LENGTH)
+
+    async def translate_chunks(
+        self, chunks, target_lang="ru", user_id=None, priority=PRIORITY_QUICK, source_lang=None, user_glossary=None
+    ):
+        """
+        Параллельный перевод частей длинного текста.
+        Асинхронный генератор: отдает по порядку (перевод или None, разделитель)
+        по мере готовности. Первая часть идет с приоритетом priority, остальные
+        фоном, поэтому первый текст приходит так же быстро, как для короткого.
+        Каждая часть засчитывается как отдельный перевод (неудачные возвращаются),
+        при нехватке лимита выбрасывает QuotaExceededError
+        """
+        source_lang = source_lang or (detect_language(chunks[0][0]) if chunks else None)
+        if source_lang == target_lang:
+            for chunk, separator in chunks:
+                yield chunk, separator
+            return
+
+        if user_id and not self._consume(user_id, len(chunks)):
+            raise QuotaExceededError(f"Недостаточно переводов для {len(chunks)} частей")
+
+        logger.info("Перевод длинного текста", extra={"chunks": len(chunks), "target_lang": target_lang})
+        tasks = [
+            asyncio.ensure_future(
+                self._translate_text(
+                    chunk, target_lang, priority if index == 0 else PRIORITY_BULK, source_lang,
+                    self.glossaries.select(chunk, source_lang, target_lang, user_glossary),
+                )
+            )
+            for index, (chunk, _) in enumerate(chunks)
+        ]
+        unpaid = len(chunks)
+        try:
+            for task, (_, separator) in zip(tasks, chunks):
+                try:
+                    async with deadline_limit():
+                        translated = await task
+                except TranslatorUnavailable:
+                    raise
+                except Exception as e:
+                    logger.warning("Ошибка при переводе части", extra={"error": repr(e)})
+                    translated = None
+                if translated is not None:
+                    unpaid -= 1
+                yield translated, separator
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Непереведенные части не засчитываются
+            if user_id and unpaid:
+                self.quota.refund(user_id, unpaid)
+
+    async def translate_texts(
+        self, texts, target_lang, source_lang=None, user_glossary=None, priority=PRIORITY_BULK, source_hint=None
+    ):
+        """
+        Перевод пачки текстов документа или сводки группы одним запросом к API
+        (без списания лимита). Готовые переводы берутся из кэша, а новые в кэш
+        не записываются, чтобы большой файл не вытеснил переводы сообщений.
+        Одинаковые тексты пачки переводятся один раз; без source_lang язык
+        каждого текста определяет API.
+        source_hint - вероятный язык текстов: по нему выбирается глоссарий,
+        и только вместе с глоссарием он уходит в API как исходный язык
+        """
+        if source_lang == target_lang:
+            return list(texts)
+
+        glossary = self.glossaries.select("\n".join(texts), source_lang or source_hint, target_lang, user_glossary)
+        if glossary is not None and not source_lang:
+            # API принимает глоссарий только с исходным языком
+            source_lang = source_hint
+        variant = glossary.key if glossary else ""
+
+        translations = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            cached = await self.cache.get(text, target_lang, source_lang, variant=variant)
+            if cached is None:
+                missing.append(text)
+            else:
+                translations[text] = cached
+
+        for part in _batches(missing):
+            self._check_available()
+            async with deadline_limit():
+                translated = await self._request_translations(part, target_lang, source_lang, priority, glossary)
+            if len(translated) != len(part):
+                raise TranslateApiError(200, "число переводов не совпадает с числом текстов")
+            translations.update(zip(part, translated))
+
+        return [translations[text] for text in texts]
+
+    def _check_available(self):
+        """Быстрый отказ, если очередь к API переполнена или API недоступно"""
+        if self.governor.is_overloaded():
+            raise OverloadedError("Очередь запросов к API переполнена")
+        if self.resilience.breaker.is_open():
+            raise CircuitOpenError("Сервис перевода временно недоступен")
+
+    async def _lookup(self, text, target_lang, source_lang=None, glossary=None):
+        """
+        Перевод из кэша, а при промахе - из памяти переводов. Исходный язык -
+        часть ключа: перевод с неверно указанным языком не достается тем,
+        для кого язык определял API
+        """
+        variant = glossary.key if glossary else ""
+        cached = await self.cache.get(text, target_lang, source_lang, variant=variant)
+        if cached is None and self.memory is not None:
+            cached = self.memory.lookup(text, target_lang, _memory_variant(source_lang, variant))
+        return cached
+
+    async def _translate_text(self, text, target_lang, priority, source_lang=None, glossary=None):
+        """Перевод без проверки лимитов: кэш, затем API"""
+        if not text.strip():
+            return text
+        cached = await self._lookup(text, target_lang, source_lang, glossary)
+        if cached is not None:
+            return cached
+        self._check_available()
+        return await self._translate_shared(text, target_lang, priority, source_lang, glossary)
+
+    async def _translate_shared(self, text, target_lang, priority, source_lang=None, glossary=None):
+        """Отправка через общую пачку запросов (одинаковые тексты - один раз)"""
+        return await self.inflight.do(
+            make_key(text, target_lang, source_lang, variant=glossary.key if glossary else ""),
+            lambda: self._translate_uncached(text, target_lang, priority, source_lang, glossary),
+        )
+
+    async def _translate_uncached(self, text, target_lang, priority, source_lang=None, glossary=None):
+        """
+        Перевод через API с сохранением результата в кэш и память переводов.
+        Известный исходный язык передается в API, чтобы не тратить время на его определение
+        """
+        translated_text = await self.batcher.submit(
+            text, target_lang, source_lang, priority=priority, glossary=glossary
+        )
+        variant = glossary.key if glossary else ""
+        self.cache.put(text, target_lang, translated_text, source_lang, variant=variant)
+        if self.memory is not None:
+            self.memory.add(text, target_lang, translated_text, _memory_variant(source_lang, variant))
+        return translated_text
+
+    async def _request_translations(self, texts, target_lang, source_lang=None, priority=PRIORITY_QUICK, glossary=None):
+        """Один запрос к API для нескольких текстов (с повторами при временных ошибках)"""
+        chars = sum(len(text) for text in texts)
+
+        async def attempt():
+            # Ожидание своей очереди в рамках лимитов API
+            await self.governor.acquire(chars, priority)
+            return await self._post_translations(texts, target_lang, source_lang, glossary)
+
+        translated = await self.resilience.call(attempt)
+        # Один раз на успешный запрос: повторы и дублирующие запросы не считаются
+        metrics.TRANSLATED_CHARS.inc(chars, lang=target_lang)
+        return translated
+
+    async def _post_translations(self, texts, target_lang, source_lang=None, glossary=None):
+        """HTTP-запрос к API перевода"""
         # Данные для запроса
         data = {
             "folderId": self.folder_id,
-            "texts": [text],
+            "texts": texts,
             "targetLanguageCode": target_lang
         }
-        
+        if source_lang:
+            data["sourceLanguageCode"] = source_lang
+        if glossary is not None:
+            data["glossaryConfig"] = glossary.to_api()
+
+        # Запрос не ждет ответа дольше срока обработки
+        left = remaining()
+        timeout = self._timeout if left is None or left >= self._timeout.read else httpx.Timeout(
+            left, connect=min(left, self._timeout.connect)
+        )
+        started = time.perf_counter()
         try:
-            print(f"Перевод: '{text[:30]}...' на {target_lang}")
-            
-            # Отправка запроса
-            response = requests.post(url, json=data, headers=headers, timeout=10)
-
-            # Увеличивание счетчика пользователя
-            if user_id:
-                today = date.today()
-                user_key = self._get_user_key(user_id, today)
-                self.user_usage[user_key] = self.user_usage.get(user_key, 0) + 1
-            
-            # Проверка ответа
-            if response.status_code == 200:
-                result = response.json()
-                translations = result.get("translations", [])
-                
-                if translations:
-                    translated_text = translations[0].get("text", "")
-                    print("Успешно переведено")
-                    return translated_text
-                else:
-                    print("Ошибка: нет перевода в ответе")
-                    return None
-            else:
-                print(f"Ошибка API: {response.status_code}")
-                print(f"Ответ: {response.text[:100]}")
-                return None
-                
-        except Exception as e:
-            print(f"Ошибка при запросе: {e}")
-            return None
+            response = await self._get_client().post(YANDEX_TRANSLATE_URL, json=data, timeout=timeout)
+        except httpx.TimeoutException:
+            self._observe_api("timeout", started)
+            raise
+        except httpx.TransportError:
+            self._observe_api("network", started)
+            raise
+        self._observe_api(str(response.status_code), started)
+
+        # Проверка ответа
+        if response.status_code != 200:
+            retry_after = response.headers.get("Retry-After")
+            raise TranslateApiError(
+                response.status_code,
+                response.text[:100],
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+
+        translations = response.json().get("translations", [])
+        if not translations:
+            raise TranslateApiError(response.status_code, "нет перевода в ответе")
+
+        return [item.get("text", "") for item in translations]
+
+    @staticmethod
+    def _observe_api(status, started):
+        metrics.API_REQUESTS.inc(status=status)
+        metrics.API_LATENCY.observe(time.perf_counter() - started, status=status)
         
     def get_user_usage(self, user_id):
         """Информация об использовании для пользователя"""
-        today = date.today()
-        user_key = self._get_user_key(user_id, today)
-        user_count = self.user_usage.get(user_key, 0)
+        user_count = self.quota.get(user_id)
         
         remaining = self.max_uses_per_user - user_count
         
@@ -132,30 +503,68 @@ class SimpleTranslator:
     
     def reset_user(self, user_id):
         """Тестовый сброс для себя"""
-        today = date.today()
-        user_key = self._get_user_key(user_id, today)
-        
-        if user_key in self.user_usage:
-            self.user_usage[user_key] = 0
-            print(f"Сбросил счетчик для пользователя {user_id}")
+        if self.quota.reset(user_id):
+            logger.info("Счетчик сброшен", extra={"user_id": user_id})
             return True
         return False
     
+    def forget_user(self, user_id):
+        """
+        Сброс данных пользователя в памяти процесса: пользователь перешел
+        к этому воркеру, и его счетчик нужно перечитать из общего хранилища
+        """
+        if isinstance(self.quota, SqliteQuotaStore):
+            self.quota.forget(user_id)
+
     def get_languages(self):
         """Возвращает словарь поддерживаемых языков"""
-        languages = {
-            "ru": "Русский",
-            "en": "Английский", 
-            "es": "Испанский",
-            "fr": "Французский",
-            "de": "Немецкий",
-            "it": "Итальянский",
-            "zh": "Китайский",
-            "ja": "Японский",
-            "ko": "Корейский",
+        return self.languages.names
+
+    async def _fetch_languages(self):
+        """Список языков из API: {код: название}"""
+        response = await self._get_client().post(YANDEX_LANGUAGES_URL, json={"folderId": self.folder_id})
+        if response.status_code != 200:
+            raise TranslateApiError(response.status_code, response.text[:100])
+        return {
+            item["code"]: item.get("name", "")
+            for item in response.json().get("languages", [])
+            if item.get("code")
         }
-        return languages
 
 
-# Глобальный экземпляр
-translator = SimpleTranslator()
\ No newline at end of file
+# Общий экземпляр создается при первом обращении, а не при импорте
+_translator = None
+
+
+def _batches(texts):
+    """Тексты порциями в пределах лимитов одного запроса к API (по числу и по символам)"""
+    part, chars = [], 0
+    for text in texts:
+        if part and (len(part) >= BATCH_MAX_TEXTS or chars + len(text) > BATCH_MAX_CHARS):
+            yield part
+            part, chars = [], 0
+        part.append(text)
+        chars += len(text)
+    if part:
+        yield part
+
+
+def _memory_variant(source_lang, variant):
+    """Вариант памяти переводов: исходный язык и глоссарий"""
+    return f"{source_lang or ''}#{variant}"
+
+
+def get_translator():
+    """Общий переводчик"""
+    global _translator
+    if _translator is None:
+        _translator = SimpleTranslator()
+    return _translator
+
+
+async def close_translator():
+    """Закрытие переводчика, если он был создан"""
+    global _translator
+    if _translator is not None:
+        await _translator.close()
+        _translator = None
\ No newline at end of file
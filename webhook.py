@@ -0,0 +1,72 @@
+"""
+webhook.py - Точка входа для Yandex Cloud Functions (режим webhook)
+
+Функция получает одно обновление Telegram в теле HTTP-запроса.
+Application и переводчик создаются при первом вызове и живут,
+пока жив экземпляр функции
+"""
+
+import base64
+import json
+
+from telegram import Update
+
+from bot import build_application
+from handlers.group import close_digests
+from config import WEBHOOK_SECRET, METRICS_TOKEN, UPDATE_DEADLINE
+from services import metrics, yandex_translate
+from services.deadline import deadline_scope
+
+_application = None
+
+
+async def _get_application():
+    """Application, инициализированный один раз на экземпляр функции"""
+    global _application
+    if _application is None:
+        application = build_application(webhook=True)
+        await application.initialize()
+        _application = application
+    return _application
+
+
+def _response(status_code, body=""):
+    return {"statusCode": status_code, "body": body}
+
+
+async def handler(event, context):
+    """Обработка одного обновления от Telegram"""
+    headers = {name.lower(): value for name, value in (event.get("headers") or {}).items()}
+
+    # Выгрузка метрик: GET .../metrics?token=METRICS_TOKEN
+    if event.get("httpMethod") == "GET" and str(event.get("path", "")).endswith("/metrics"):
+        params = event.get("queryStringParameters") or {}
+        if not METRICS_TOKEN or params.get("token") != METRICS_TOKEN:
+            return _response(403)
+        return _response(200, metrics.render())
+    if WEBHOOK_SECRET and headers.get("x-telegram-bot-api-secret-token") != WEBHOOK_SECRET:
+        return _response(403)
+
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return _response(400)
+
+    application = await _get_application()
+    # Ответ Telegram ждет недолго - перевод ограничен сроком обработки
+    with deadline_scope(UPDATE_DEADLINE):
+        await application.process_update(Update.de_json(payload, application.bot))
+
+    # Экземпляр функции может быть заморожен сразу после ответа -
+    # сводки групп публикуются, а отложенные записи настроек, лимитов и кэша сохраняются сейчас
+    await close_digests()
+    await application.update_persistence()
+    await application.persistence.flush()
+    if yandex_translate._translator is not None:
+        yandex_translate._translator.flush()
+
+    return _response(200)